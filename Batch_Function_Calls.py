@@ -0,0 +1,358 @@
+# Script Name: Batch_Function_Calls
+# Author: Joshua (Jay) Wimhurst
+# Date Created: 10/19/2026
+# Date Last Edited: 10/19/2026
+
+################################ DESCRIPTION ##################################
+# Non-interactive counterpart to Function_Calls. Every end-user decision that
+# Function_Calls asks for with a user input is instead read from a JSON
+# configuration file and/or the command line, so that many model runs can be
+# performed unattended in a single job. Each decision may be given as a single
+# value or as a list of values; every combination of the listed values is run.
+# The database is opened once, and the training corpus of each region is built
+# once and shared between all TF-IDF/alpha/eta combinations run on it. By
+# default the n-grams, dictionary, and bag of words are built only once for the
+# whole database, each region's corpus being a slice of them, and regions can
+# be trained concurrently in separate worker processes. With "updateModels",
+# runs that were already saved are updated with the documents added to the
+# database since, instead of being calibrated and trained again.
+#
+# Example configuration file (regions can also be "all" for all 40 regions):
+# {
+#     "filepath": "C:/Model Materials/",
+#     "preprocessText": "N",
+#     "regions": ["Basin-Wide", "Iowa", "Ohio (Basin)", "1990s"],
+#     "ngramSize": [1, 2, 3],
+#     "removeCommonNgrams": ["Y", "N"],
+#     "useTFIDF": ["Y", "N"],
+#     "useDefaultAlpha": ["Y", "N"],
+#     "useDefaultEta": ["Y", "N"],
+#     "sharedCorpus": "Y",
+#     "workers": 4,
+#     "updateModels": "N",
+#     "trainingOptions": {"ldaWorkers": 2}
+# }
+# The training options are those of trainingOptions in the functions script.
+#
+# Usage: python Batch_Function_Calls.py --config "Sweep.json"
+#        python Batch_Function_Calls.py --filepath "C:/Model Materials/" --regions all --ngramSize 1 2
+#        python Batch_Function_Calls.py --config "Sweep.json" --trainingOption ldaWorkers=4
+###############################################################################
+
+# Necessary packages
+import argparse
+import json
+import os
+import sys
+import traceback
+from itertools import product
+
+# Decisions that take a single value for the whole job, followed by the
+# decisions that can be swept over, with the values used when a decision is
+# missing from both the configuration file and the command line
+jobDecisions = {"filepath": None,
+                "preprocessText": "N",
+                "preprocessNewOnly": "Y",
+                "sharedCorpus": "Y",
+                "workers": 1,
+                "updateModels": "N",
+                "trainingOptions": {}}
+sweepDecisions = {"regions": ["Basin-Wide"],
+                  "ngramSize": ["1"],
+                  "removeCommonNgrams": ["N"],
+                  "useTFIDF": ["N"],
+                  "useDefaultAlpha": ["Y"],
+                  "useDefaultEta": ["Y"]}
+
+############################ READ THE CONFIGURATION ###########################
+
+# Combine the defaults, the configuration file, and the command line (in
+# increasing order of priority) into one dictionary of decisions
+def readConfig(argv=None):
+    parser = argparse.ArgumentParser(description="Run the topic model for many "
+                                     "end-user decisions without user input.")
+    parser.add_argument("--config", help="JSON file holding the end-user decisions")
+    parser.add_argument("--filepath", help="Folder containing the Model Materials")
+    parser.add_argument("--preprocessText", choices=["Y","N"])
+    parser.add_argument("--preprocessNewOnly", choices=["Y","N"])
+    parser.add_argument("--sharedCorpus", choices=["Y","N"],
+                        help="Build the corpus once for the whole database and slice it by region")
+    parser.add_argument("--workers", type=int, help="Number of regions trained at the same time")
+    parser.add_argument("--updateModels", choices=["Y","N"],
+                        help="Update saved model runs with new documents instead of training them again")
+    parser.add_argument("--trainingOption", action="append", default=[], metavar="OPTION=VALUE",
+                        help="Change one of the functions script's trainingOptions")
+    for decision in sweepDecisions:
+        parser.add_argument("--" + decision, nargs="+")
+    args = parser.parse_args(argv)
+
+    config = dict(jobDecisions)
+    config.update(sweepDecisions)
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as fp:
+            config.update(json.load(fp))
+    for decision, value in vars(args).items():
+        if decision not in ["config","trainingOption"] and value is not None:
+            config[decision] = value
+    # Training options from the command line are read as JSON where possible
+    # (numbers, true/false), and as strings otherwise
+    config["trainingOptions"] = dict(config["trainingOptions"])
+    for option in args.trainingOption:
+        name, _, value = option.partition("=")
+        try:
+            config["trainingOptions"][name] = json.loads(value)
+        except ValueError:
+            config["trainingOptions"][name] = value
+
+    if not config["filepath"]:
+        parser.error("a filepath must be given in the configuration file or with --filepath")
+
+    # Swept decisions are always lists of strings, as returned by input()
+    for decision in sweepDecisions:
+        values = config[decision]
+        if not isinstance(values, list):
+            values = [values]
+        config[decision] = [str(value) for value in values]
+    return config
+
+########################### REGION TO USER DECISIONS ##########################
+
+# Each region's name (that of its Model Training Results folder) is converted
+# into the scopeOfTexts and textsOfInterest decisions made in textSelection
+def regionDecisions(region):
+    from Preprocessing_and_Topic_Modeling_Functions import stateOptions, subBasinOptions, decadeOptions
+    if region == "Basin-Wide":
+        return {"scopeOfTexts": "All"}
+    elif region in stateOptions:
+        return {"scopeOfTexts": "State", "textsOfInterest": region}
+    elif region in subBasinOptions:
+        return {"scopeOfTexts": "Sub-Basin", "textsOfInterest": region}
+    elif region in decadeOptions:
+        return {"scopeOfTexts": "Decade", "textsOfInterest": region}
+    raise ValueError("Unknown region: " + region)
+
+# Expand "all" into the names of all 40 regions
+def expandRegions(regions):
+    from Preprocessing_and_Topic_Modeling_Functions import stateOptions, subBasinOptions, decadeOptions
+    if [region.lower() for region in regions] == ["all"]:
+        return ["Basin-Wide"] + stateOptions + subBasinOptions + decadeOptions
+    return regions
+
+############################## PRE-PROCESS THE PDFS ###########################
+
+# Same pre-processing loop as in Function_Calls
+def preprocessPDFs(filepath):
+    from natsort import natsorted
+    from Preprocessing_and_Topic_Modeling_Functions import (pdfFileList, pdfDocuments, pdfToText,
+                                                            delUnwantedLines, delInsideLines,
+                                                            tokenizeAndRemove, appendAndSave)
+    stopwordsFilePath = filepath + "Stopwords.csv"
+    fileList = pdfFileList(filepath + "Document Details.xlsx")
+    finalTexts = []
+    for file, document in pdfDocuments(filepath, natsorted(fileList)):
+        print(file + "\n")
+        text = pdfToText(document)
+        text = delUnwantedLines(text)
+        text = delInsideLines(text)
+        text = tokenizeAndRemove(text,stopwordsFilePath)
+        finalTexts.append(text)
+    appendAndSave(filepath + "Document Details.xlsx",finalTexts)
+
+############################ FIND A SAVED MODEL RUN ###########################
+
+# The sub-folder of a model run that was saved with the same decisions, made
+# either with or without pre-processing the PDFs again (the current choice is
+# preferred), or None if the run hasn't been saved yet
+def savedRunFolder(filepath, region, yesNo, ngram, remove, tfidf, alpha, eta):
+    decisions = "_Ngram" + ngram + "_Remove" + remove + "_TFIDF" + tfidf + "_Alpha" + alpha + "_Eta" + eta
+    for redo in [yesNo] + [x for x in ["Y","N"] if x != yesNo]:
+        subFolderName = "Redo" + redo + decisions
+        if os.path.exists(filepath + "/Model Training Results/" + region + "/" + subFolderName + "/Trained Model"):
+            return subFolderName
+    return None
+
+############################### RUN ONE REGION ################################
+
+# Change the functions script's trainingOptions to those of the job
+def applyTrainingOptions(trainingOptions):
+    import Preprocessing_and_Topic_Modeling_Functions as ptm
+    for option, value in trainingOptions.items():
+        if option not in ptm.trainingOptions:
+            raise ValueError("Unknown training option: " + option)
+        ptm.trainingOptions[option] = value
+
+# Shared by all regions run in the same process (set by startWorker)
+workerDatabase = None
+workerSharedCorpus = None
+
+# Each worker process opens its figures without a display, applies the
+# training options, and keeps its own copy of the database, shared corpus,
+# token store, and near-duplicate index for all the regions it runs (a worker
+# that is spawned rather than forked doesn't inherit the parent's)
+def startWorker(database, sharedCorpus, trainingOptions, tokenStore=None, nearDuplicateIndex=None):
+    global workerDatabase, workerSharedCorpus
+    import matplotlib
+    import multiprocessing
+    import Preprocessing_and_Topic_Modeling_Functions as ptm
+    matplotlib.use("Agg")
+    applyTrainingOptions(trainingOptions)
+    # (a forked worker would otherwise start with the stages the parent
+    # process had already recorded, which are saved in the job's own trace)
+    if multiprocessing.parent_process() is not None:
+        ptm.stageEvents.clear()
+    ptm.tokenStore = tokenStore
+    ptm.nearDuplicateIndex = nearDuplicateIndex
+    workerDatabase = database
+    workerSharedCorpus = sharedCorpus
+
+# Build a region's training corpus and word cloud once, then train and
+# evaluate the LDA algorithm for every TF-IDF, alpha, and eta decision (or
+# update the saved model run with new documents, if asked to)
+def runRegion(region, ngram, remove, modelDecisions, filepath, yesNo, updateModels="N"):
+    import matplotlib.pyplot as plt
+    import Preprocessing_and_Topic_Modeling_Functions as ptm
+
+    # Record which model runs fail, so the rest of the batch can still finish
+    failedRuns = []
+    try:
+        ptm.presetDecisions.update(regionDecisions(region))
+        ptm.presetDecisions["ngramSize"] = ngram
+        ptm.presetDecisions["removeCommonNgrams"] = remove
+        ptm.textSelection(workerDatabase)
+        trainingCorpus = ptm.createCorpus(ptm.textsForTraining,filepath,workerSharedCorpus)
+        ngramIndex = ptm.ngramIndex
+        if workerSharedCorpus is not None:
+            ngramIDs, bagOfWords = ptm.sliceSharedBagOfWords(workerSharedCorpus,ptm.selectedIndices)
+        else:
+            ngramIDs, bagOfWords = None, None
+    except Exception:
+        traceback.print_exc()
+        return [(region, ngram, remove)]
+    finally:
+        plt.close("all")
+
+    # The word cloud is moved into each run's sub-folder by moveToSubFolder,
+    # so keep a copy to put back before the next run
+    wordCloudPath = filepath + "/Model Training Results/" + region + "/Full Corpus.png"
+    with open(wordCloudPath, 'rb') as fp:
+        wordCloudImage = fp.read()
+
+    for tfidf, alpha, eta in modelDecisions:
+        print("\nModel run: " + region + ", Ngram" + ngram + ", Remove" + remove +
+              ", TFIDF" + tfidf + ", Alpha" + alpha + ", Eta" + eta)
+        try:
+            if not os.path.exists(wordCloudPath):
+                with open(wordCloudPath, 'wb') as fp:
+                    fp.write(wordCloudImage)
+            ptm.presetDecisions["useTFIDF"] = tfidf
+            ptm.presetDecisions["useDefaultAlpha"] = alpha
+            ptm.presetDecisions["useDefaultEta"] = eta
+            savedRun = None
+            if updateModels == "Y":
+                savedRun = savedRunFolder(filepath, region, yesNo, ngram, remove, tfidf, alpha, eta)
+            if savedRun is not None:
+                ptm.updateSavedModel(filepath, savedRun, workerDatabase)
+                # The word cloud now includes the new documents too
+                os.replace(wordCloudPath, filepath + "/Model Training Results/" + region + "/" + savedRun + "/Full Corpus.png")
+                # Put back the region's selection, training corpus, and index, which
+                # the update replaced with those of the saved model
+                ptm.textSelection(workerDatabase)
+                ptm.trainingCorpus = trainingCorpus
+                ptm.ngramIndex = ngramIndex
+                continue
+            trainedModel = ptm.trainLDAAlgorithm(trainingCorpus,filepath,ngramIDs,bagOfWords)
+            ptm.evaluateTrainedModel(trainedModel,filepath)
+            ptm.writeTextFile(filepath, yesNo)
+            ptm.saveTrainedModel(trainedModel, filepath, yesNo)
+            ptm.moveToSubFolder(filepath, yesNo)
+        except Exception:
+            traceback.print_exc()
+            failedRuns.append((region, ngram, remove, tfidf, alpha, eta))
+        finally:
+            # Close all figures so they don't accumulate over the batch
+            plt.close("all")
+    return failedRuns
+
+################################ RUN THE BATCH ################################
+
+# Run every combination of decisions, sharing the opened database between all
+# regions and each region's training corpus between all the TF-IDF, alpha,
+# and eta decisions trained on it
+def runBatch(config):
+    from concurrent.futures import ProcessPoolExecutor
+    import Preprocessing_and_Topic_Modeling_Functions as ptm
+
+    filepath = config["filepath"]
+    # (also applied here so that pre-processing and building the shared
+    # corpus are profiled if asked to)
+    applyTrainingOptions(config["trainingOptions"])
+    ptm.presetDecisions["preprocessText"] = config["preprocessText"]
+    ptm.presetDecisions["preprocessNewOnly"] = config["preprocessNewOnly"]
+
+    # Pre-process the PDFs first if asked to, then open the database once
+    ptm.preprocessText(["Y","N"],"")
+    yesNo = ptm.preprocessText.yesNo
+    if yesNo == "Y":
+        preprocessPDFs(filepath)
+    database = ptm.openDocumentDetails(filepath + "Document Details.xlsx")
+
+    failedRuns = []
+    jobEvents = []
+    regions = expandRegions(config["regions"])
+    corpusDecisions = list(product(config["ngramSize"], config["removeCommonNgrams"]))
+    modelDecisions = list(product(config["useTFIDF"], config["useDefaultAlpha"],
+                                  config["useDefaultEta"]))
+    print("\nRunning " + str(len(regions)*len(corpusDecisions)*len(modelDecisions)) + " model runs")
+
+    for ngram, remove in corpusDecisions:
+        # Build the n-grams, dictionary, and bag of words once for all regions
+        sharedCorpus = None
+        if config["sharedCorpus"] == "Y":
+            try:
+                sharedCorpus = ptm.buildSharedCorpus(database,ngram,remove)
+            except Exception:
+                traceback.print_exc()
+                failedRuns.extend((region, ngram, remove) for region in regions)
+                continue
+
+        # Save the stages recorded in this process so far (pre-processing,
+        # opening the database, and building the shared corpus) as the job's
+        # own trace, before the regions' model runs record theirs
+        if ptm.trainingOptions["profileStages"]:
+            jobEvents += ptm.stageEvents
+            ptm.stageEvents[:] = jobEvents
+            os.makedirs(filepath + "/Model Training Results", exist_ok=True)
+            ptm.writeStageTrace(filepath + "/Model Training Results/Batch Stage Profile.json")
+
+        # Run the regions one after another in this process, or concurrently
+        # in a pool of worker processes
+        if int(config["workers"]) <= 1:
+            startWorker(database, sharedCorpus, config["trainingOptions"], ptm.tokenStore, ptm.nearDuplicateIndex)
+            for region in regions:
+                failedRuns.extend(runRegion(region, ngram, remove, modelDecisions, filepath, yesNo,
+                                            config["updateModels"]))
+        else:
+            with ProcessPoolExecutor(int(config["workers"]), initializer=startWorker,
+                                     initargs=(database, sharedCorpus, config["trainingOptions"], ptm.tokenStore,
+                                               ptm.nearDuplicateIndex)) as pool:
+                results = [pool.submit(runRegion, region, ngram, remove, modelDecisions, filepath, yesNo,
+                                       config["updateModels"])
+                           for region in regions]
+                for region, result in zip(regions, results):
+                    try:
+                        failedRuns.extend(result.result())
+                    except Exception:
+                        traceback.print_exc()
+                        failedRuns.append((region, ngram, remove))
+
+    if failedRuns:
+        print("\nThe following model runs failed:")
+        for run in failedRuns:
+            print(", ".join(run))
+    else:
+        print("\nAll model runs completed.")
+    return failedRuns
+
+if __name__ == "__main__":
+    failedRuns = runBatch(readConfig())
+    sys.exit(1 if failedRuns else 0)
@@ -0,0 +1,319 @@
+# Script Name: Golden_Output_Check
+# Author: Joshua (Jay) Wimhurst
+# Date Created: 10/19/2026
+# Date Last Edited: 10/19/2026
+
+################################ DESCRIPTION ##################################
+# Checks that a faster version of the pre-processing functions still gives
+# exactly the same output as the original. The original is the functions
+# script as committed at a git revision (HEAD by default, i.e. before the
+# uncommitted changes being checked) or a saved copy of the script, and the
+# optimized version is the functions script as it is now. Both are run over
+# the same fixed set of PDFs (the synthetic PDFs of Pipeline_Benchmark, a
+# sample of the bundled PDF archives, and any other PDFs given):
+#   pdfToText, delUnwantedLines, delInsideLines, tokenizeAndRemove (per PDF)
+#   createCorpus (over all pre-processed texts, with and without removing the
+#   commonest n-grams)
+# Each stage is given the original's output of the stage before it, so that a
+# divergence is found in the stage that caused it. The optimized pageText is
+# also checked on made-up pages when tables and figures are left out (see
+# trainingOptions["skipTablesAndFigures"]): a page of three-column prose must
+# keep all of its text, and a page with a table of numbers must lose only the
+# table. Outputs are compared token
+# by token, and the speed ratio (original time / optimized time) of each
+# stage is reported with any divergences. The script exits with an error if
+# any output diverges, or if a stage couldn't be checked (NLTK's WordNet data
+# missing for tokenizeAndRemove, or an original too old for createCorpus to be
+# run without user input) unless --allowSkips is given.
+# The original functions script as first written asks whether to pre-process
+# the PDFs when it is imported, which is answered "N" here, so its
+# pre-processing stages can be checked; createCorpus can only be checked
+# against the batch runner's version of the script and later ones, which take
+# their decisions from presetDecisions.
+#
+# Usage: python Golden_Output_Check.py
+#        python Golden_Output_Check.py --original HEAD~3 --pdfs "C:/Model Materials/PDFs/"
+#        python Golden_Output_Check.py --originalFile "Original Functions.py" --report "Golden Report.json"
+#        python Golden_Output_Check.py --original e5582fd --allowSkips
+###############################################################################
+
+# Necessary packages
+import argparse
+import difflib
+import importlib.util
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz
+import pandas as pd
+
+# Folder holding this script and the functions script
+scriptFolder = os.path.dirname(os.path.abspath(__file__))
+functionsScript = "Preprocessing_and_Topic_Modeling_Functions.py"
+
+########################### LOAD BOTH VERSIONS ################################
+
+# Import a copy of the functions script under a different module name, so
+# that both versions can be used side by side
+def importCopy(sourcePath, moduleName):
+    spec = importlib.util.spec_from_file_location(moduleName, sourcePath)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[moduleName] = module
+    spec.loader.exec_module(module)
+    return module
+
+# The original functions script, from a git revision or a saved copy
+def loadOriginal(workFolder, revision="HEAD", originalFile=None):
+    originalPath = os.path.join(workFolder, "Original_Functions.py")
+    if originalFile:
+        shutil.copy(originalFile, originalPath)
+    else:
+        source = subprocess.run(["git", "show", revision + ":" + functionsScript], cwd=scriptFolder,
+                                capture_output=True, check=True).stdout
+        with open(originalPath, 'wb') as fp:
+            fp.write(source)
+    # (an original that asks whether to pre-process the PDFs when it is
+    # imported is told not to)
+    import builtins
+    realInput = builtins.input
+    builtins.input = lambda message="": "N"
+    try:
+        return importCopy(originalPath, "Original_Functions")
+    finally:
+        builtins.input = realInput
+
+############################# COMPARE OUTPUTS #################################
+
+# Outputs are compared as lists of tokens: lines of text split on whitespace
+def tokens(output):
+    if isinstance(output, str):
+        output = output.splitlines()
+    return [token for line in output for token in (line.split() or ["<empty line>"])]
+
+# Describe where two outputs first diverge, or return None if they're the same
+def divergence(original, optimized):
+    if original == optimized:
+        return None
+    originalTokens, optimizedTokens = tokens(original), tokens(optimized)
+    if originalTokens == optimizedTokens:
+        return "same tokens, but different whitespace or line breaks"
+    matcher = difflib.SequenceMatcher(None, originalTokens, optimizedTokens, autojunk=False)
+    changes = [opcode for opcode in matcher.get_opcodes() if opcode[0] != "equal"]
+    tag, i1, i2, j1, j2 = changes[0]
+    return ("%d changed token runs; first at token %d (%s): %s -> %s"
+            % (len(changes), i1, tag, " ".join(originalTokens[i1:min(i2, i1+10)]) or "(nothing)",
+               " ".join(optimizedTokens[j1:min(j2, j1+10)]) or "(nothing)"))
+
+# Run one stage of both versions on the same input, timing each
+def runBoth(stage, originalFunction, optimizedFunction, originalArgs, optimizedArgs):
+    start = time.perf_counter()
+    originalOutput = originalFunction(*originalArgs)
+    originalTime = time.perf_counter() - start
+    start = time.perf_counter()
+    optimizedOutput = optimizedFunction(*optimizedArgs)
+    optimizedTime = time.perf_counter() - start
+    stage["compared"] += 1
+    stage["originalSeconds"] += originalTime
+    stage["optimizedSeconds"] += optimizedTime
+    return originalOutput, optimizedOutput
+
+def newStage():
+    return {"compared": 0, "identical": 0, "originalSeconds": 0, "optimizedSeconds": 0, "divergences": []}
+
+# A stage that couldn't be run, and why
+def skippedStage(reason):
+    print(reason)
+    return dict(newStage(), skipped=reason)
+
+def record(stage, name, originalOutput, optimizedOutput):
+    difference = divergence(originalOutput, optimizedOutput)
+    if difference is None:
+        stage["identical"] += 1
+    else:
+        stage["divergences"].append(name + ": " + difference)
+
+############################ PRE-PROCESSING STAGES ############################
+
+def checkPreprocessing(original, optimized, pdfPaths, stopwordsFilePath, stages):
+    texts = []
+    lemmatization = True
+    for pdfPath in pdfPaths:
+        name = os.path.basename(pdfPath)
+        with fitz.open(pdfPath) as originalDocument, fitz.open(pdfPath) as optimizedDocument:
+            originalText, optimizedText = runBoth(stages["pdfToText"], original.pdfToText, optimized.pdfToText,
+                                                  (originalDocument,), (optimizedDocument,))
+        record(stages["pdfToText"], name, originalText, optimizedText)
+        for stageName in ["delUnwantedLines", "delInsideLines"]:
+            originalOutput, optimizedOutput = runBoth(stages[stageName], getattr(original, stageName),
+                                                      getattr(optimized, stageName),
+                                                      (list(originalText),), (list(originalText),))
+            record(stages[stageName], name, originalOutput, optimizedOutput)
+            originalText = originalOutput
+        if lemmatization:
+            try:
+                originalOutput, optimizedOutput = runBoth(stages["tokenizeAndRemove"], original.tokenizeAndRemove,
+                                                          optimized.tokenizeAndRemove,
+                                                          (originalText, stopwordsFilePath), (originalText, stopwordsFilePath))
+                record(stages["tokenizeAndRemove"], name, originalOutput, optimizedOutput)
+                originalText = originalOutput
+            except LookupError:
+                lemmatization = False
+                stages["tokenizeAndRemove"] = skippedStage("NLTK WordNet data is missing, so tokenizeAndRemove is not checked")
+        if not lemmatization:
+            originalText = " ".join(originalText.lower().split())
+        texts.append(originalText)
+    return texts
+
+############################### CREATE CORPUS #################################
+
+# createCorpus of both versions over the same database, for each choice of
+# removing the commonest n-grams
+def checkCreateCorpus(original, optimized, texts, filepath, stages, ngramSize):
+    import matplotlib.pyplot as plt
+    database = pd.DataFrame({"Text ID": range(len(texts)),
+                             "Preprocessed Text": texts,
+                             "Document Title": ["Document " + str(i) for i in range(len(texts))],
+                             "Citations": ["Citation " + str(i) for i in range(len(texts))],
+                             "State(s)": ["Iowa"]*len(texts),
+                             "River/Sub-Basin(s)": ["Upper Mississippi"]*len(texts),
+                             "URL": ["http://example.org/" + str(i) for i in range(len(texts))],
+                             "Year": [2000]*len(texts)})
+    for remove in ["N", "Y"]:
+        stageName = "createCorpus (remove commonest " + remove + ")"
+        if not hasattr(original, "presetDecisions"):
+            stages[stageName] = skippedStage("The original asks for its decisions with user inputs, so " + stageName
+                                             + " is not checked")
+            continue
+        stages[stageName] = newStage()
+        for module in [original, optimized]:
+            module.presetDecisions.update({"scopeOfTexts": "All", "ngramSize": str(ngramSize),
+                                           "removeCommonNgrams": remove})
+            module.textSelection(database)
+        originalCorpus, optimizedCorpus = runBoth(stages[stageName], original.createCorpus, optimized.createCorpus,
+                                                  (original.textsForTraining, filepath),
+                                                  (optimized.textsForTraining, filepath))
+        plt.close("all")
+        stages[stageName]["compared"] = 0
+        for number, (originalNgrams, optimizedNgrams) in enumerate(zip(originalCorpus, optimizedCorpus)):
+            stages[stageName]["compared"] += 1
+            record(stages[stageName], "Document " + str(number), originalNgrams, optimizedNgrams)
+        if len(originalCorpus) != len(optimizedCorpus):
+            stages[stageName]["divergences"].append("%d documents -> %d documents" % (len(originalCorpus), len(optimizedCorpus)))
+        stages[stageName]["compared"] += 1
+        record(stages[stageName], "150 commonest n-grams", [str(x) for x in original.commonNgrams],
+               [str(x) for x in optimized.commonNgrams])
+
+######################### TABLE AND FIGURE DETECTION ##########################
+
+# A page of running text with three columns, whose lines share baselines
+# across the page like the cells of a table do
+def threeColumnProsePage(document):
+    import Pipeline_Benchmark
+    page = document.new_page()
+    width = (page.rect.width - 144 - 24)/3
+    for column in range(3):
+        left = 72 + column*(width + 12)
+        page.insert_textbox(fitz.Rect(left, 72, left + width, page.rect.height - 72),
+                            Pipeline_Benchmark.syntheticParagraph(random.Random(column)) + " "
+                            + Pipeline_Benchmark.syntheticParagraph(random.Random(column + 3)), fontsize=9)
+    return page
+
+# A page with a paragraph above a table of site measurements
+def numericTablePage(document):
+    page = document.new_page()
+    page.insert_textbox(fitz.Rect(72, 72, page.rect.width - 72, 120),
+                        "Wetland vegetation recovered within two years of the restoration.", fontsize=10)
+    for number, row in enumerate([["Site", "Flow (m3/s)", "Nitrogen", "Depth"], ["Alpha", "12.5", "3.1%", "4.0"],
+                                  ["Beta", "9.8", "2.7%", "3.3-4.1"]]):
+        for column, cell in enumerate(row):
+            page.insert_text((72 + 110*column, 160 + 14*number), cell, fontsize=9)
+    return page
+
+# The optimized pageText, leaving out tables and figures, against the text
+# each made-up page should keep
+def checkTableDetection(optimized, stages):
+    stage = stages["pageText (tables left out)"] = newStage()
+    with fitz.open() as document:
+        page = threeColumnProsePage(document)
+        stage["compared"] += 1
+        record(stage, "three-column prose page", optimized.pageText(page), optimized.pageText(page, True))
+        page = numericTablePage(document)
+        stage["compared"] += 1
+        record(stage, "page with a table of numbers",
+               "Wetland vegetation recovered within two years of the restoration.\n", optimized.pageText(page, True))
+
+################################ RUN THE CHECK ################################
+
+def runCheck(revision, originalFile, pdfFolders, documents, zipSamples, ngramSize):
+    import matplotlib
+    matplotlib.use("Agg")
+    sys.path.insert(0, scriptFolder)
+    import Pipeline_Benchmark
+    import Preprocessing_and_Topic_Modeling_Functions as optimized
+
+    workFolder = tempfile.mkdtemp(prefix="Golden_Output_Check_")
+    try:
+        original = loadOriginal(workFolder, revision, originalFile)
+        filepath = Pipeline_Benchmark.makeModelMaterials(workFolder)
+        os.makedirs(os.path.join(workFolder, "Synthetic PDFs"))
+        os.makedirs(os.path.join(workFolder, "Real PDFs"))
+        pdfPaths = Pipeline_Benchmark.makeSyntheticPDFs(os.path.join(workFolder, "Synthetic PDFs"), documents)
+        pdfPaths += Pipeline_Benchmark.sampleZipPDFs(os.path.join(workFolder, "Real PDFs"), zipSamples)
+        for folder in pdfFolders:
+            pdfPaths += [os.path.join(folder, x) for x in sorted(os.listdir(folder)) if x.lower().endswith(".pdf")]
+
+        stages = {stageName: newStage() for stageName in ["pdfToText", "delUnwantedLines",
+                                                          "delInsideLines", "tokenizeAndRemove"]}
+        print("\nChecking pre-processing of " + str(len(pdfPaths)) + " PDFs...")
+        texts = checkPreprocessing(original, optimized, pdfPaths, filepath + "Stopwords.csv", stages)
+        print("Checking createCorpus...")
+        checkCreateCorpus(original, optimized, texts, filepath, stages, ngramSize)
+        print("Checking table detection...")
+        checkTableDetection(optimized, stages)
+    finally:
+        shutil.rmtree(workFolder, ignore_errors=True)
+    return stages
+
+def printReport(stages):
+    print("\n%-36s %9s %9s %10s %10s %7s" % ("Stage", "Compared", "Identical", "Original", "Optimized", "Speed"))
+    for stageName, stage in stages.items():
+        speed = stage["originalSeconds"]/stage["optimizedSeconds"] if stage["optimizedSeconds"] > 0 else float("nan")
+        print("%-36s %9d %9d %9.3fs %9.3fs %6.2fx" % (stageName, stage["compared"], stage["identical"],
+                                                     stage["originalSeconds"], stage["optimizedSeconds"], speed))
+    for stageName, stage in stages.items():
+        if "skipped" in stage:
+            print("\n" + stageName + " was skipped: " + stage["skipped"])
+        if stage["divergences"]:
+            print("\n" + stageName + " diverged for " + str(len(stage["divergences"])) + " outputs:")
+            for line in stage["divergences"][:20]:
+                print("  " + line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check optimized functions against the original outputs.")
+    parser.add_argument("--original", default="HEAD", help="git revision of the original functions script")
+    parser.add_argument("--originalFile", help="Saved copy of the original functions script (instead of --original)")
+    parser.add_argument("--pdfs", nargs="*", default=[], help="Folders of other PDFs to check")
+    parser.add_argument("--documents", type=int, default=40, help="Number of synthetic PDFs")
+    parser.add_argument("--zipSamples", type=int, default=10, help="Real PDFs sampled from each archive")
+    parser.add_argument("--ngramSize", type=int, default=2)
+    parser.add_argument("--report", help="Also save the report as JSON to this file")
+    parser.add_argument("--allowSkips", action="store_true",
+                        help="Pass even if some stages couldn't be checked")
+    args = parser.parse_args()
+
+    stages = runCheck(args.original, args.originalFile, args.pdfs, args.documents, args.zipSamples, args.ngramSize)
+    printReport(stages)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as fp:
+            json.dump(stages, fp, indent=4)
+    diverged = any(stage["divergences"] for stage in stages.values())
+    skipped = any("skipped" in stage for stage in stages.values())
+    if skipped and not args.allowSkips:
+        print("\nSome stages were not checked (use --allowSkips to pass without them)")
+    sys.exit(1 if diverged or (skipped and not args.allowSkips) else 0)
@@ -0,0 +1,67 @@
+# Script Name: Infer_Topics
+# Author: Joshua (Jay) Wimhurst
+# Date Created: 10/19/2026
+# Date Last Edited: 10/19/2026
+
+################################ DESCRIPTION ##################################
+# Finds the topics of PDFs that aren't in the Document Details database, using
+# a model saved by Function_Calls or Batch_Function_Calls, without adding the
+# PDFs to the database or retraining the model. Each PDF is pre-processed in
+# the same way as those in the database and folded into the saved model in
+# batches. The document-topic densities are written to a csv file.
+#
+# Usage: python Infer_Topics.py --model "C:/Model Materials/Model Training Results/Iowa/RedoN_Ngram1_RemoveN_TFIDFN_AlphaY_EtaY/Trained Model"
+#                               --stopwords "C:/Model Materials/Stopwords.csv"
+#                               --output "New PDF Densities.csv" "C:/New PDFs/"
+###############################################################################
+
+# Necessary packages
+import argparse
+import os
+import time
+
+import pandas as pd
+
+############################## LIST THE NEW PDFS ##############################
+
+# PDFs can be given one by one or as folders holding them
+def listPDFs(paths):
+    pdfPaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdfPaths.extend(os.path.join(path, x) for x in sorted(os.listdir(path)) if x.lower().endswith(".pdf"))
+        else:
+            pdfPaths.append(path)
+    return pdfPaths
+
+############################## INFER THE TOPICS ###############################
+
+def inferTopics(pdfPaths, modelPath, stopwordsFilePath, outputPath, batchSize):
+    from Preprocessing_and_Topic_Modeling_Functions import inferPDFTopics
+
+    start = time.perf_counter()
+    densities = []
+    for batchDensities in inferPDFTopics(pdfPaths, modelPath, stopwordsFilePath, batchSize):
+        densities.extend(batchDensities.tolist())
+        print(str(len(densities)) + " of " + str(len(pdfPaths)) + " PDFs done")
+    seconds = time.perf_counter() - start
+
+    # Same layout as the Document-Topic Densities table of a trained model
+    df = pd.DataFrame(densities, columns=["Topic " + str(i+1) for i in range(len(densities[0]))])
+    df.insert(0, "File", [os.path.basename(pdfPath) for pdfPath in pdfPaths])
+    df["Likeliest Topic"] = df.iloc[:, 1:].to_numpy().argmax(axis=1) + 1
+    df.to_csv(outputPath)
+    print("\n" + str(len(pdfPaths)) + " PDFs in %.1f s (%.1f per second)" % (seconds, len(pdfPaths)/seconds))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the topics of new PDFs with a saved model.")
+    parser.add_argument("pdfs", nargs="+", help="PDF files, or folders holding them")
+    parser.add_argument("--model", required=True, help="Trained Model folder of a saved model run")
+    parser.add_argument("--stopwords", required=True, help="Stopwords.csv used for pre-processing")
+    parser.add_argument("--output", default="Inferred Topic Densities.csv")
+    parser.add_argument("--batchSize", type=int, default=500)
+    args = parser.parse_args()
+    pdfPaths = listPDFs(args.pdfs)
+    if not pdfPaths:
+        parser.error("no PDFs were found")
+    inferTopics(pdfPaths, args.model, args.stopwords, args.output, args.batchSize)
@@ -0,0 +1,305 @@
+# Script Name: Pipeline_Benchmark
+# Author: Joshua (Jay) Wimhurst
+# Date Created: 10/19/2026
+# Date Last Edited: 10/19/2026
+
+################################ DESCRIPTION ##################################
+# Times each stage of the pre-processing and topic modeling pipeline on a fixed
+# set of documents, so that a change to the functions script can be checked
+# for making it faster or slower. The documents are synthetic PDFs made with
+# fitz (a fixed seed gives the same PDFs every time, with varied page counts,
+# contents pages, tables, in-text citations, and reference sections), plus a
+# sample of real PDFs from the bundled PDFs_*.zip archives when those have
+# been downloaded. The stages are timed with the functions script's stage
+# profiling (see trainingOptions["profileStages"]):
+#   pdfToText, delUnwantedLines, delInsideLines, tokenizeAndRemove (per PDF)
+#   textSelection, createCorpus, each calibration stage, the final model, and
+#   the evaluation figures (word clouds, density table, and word webs)
+# Results can be saved as a baseline and later runs compared against it, any
+# stage slower than the baseline by more than the tolerance being reported as
+# a regression (and the script exiting with an error).
+#
+# Usage: python Pipeline_Benchmark.py --saveBaseline "Benchmark Baseline.json"
+#        python Pipeline_Benchmark.py --baseline "Benchmark Baseline.json" [--tolerance 0.2]
+#        python Pipeline_Benchmark.py --documents 40 --zipSamples 10 --repeats 3
+###############################################################################
+
+# Necessary packages
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import zipfile
+
+import fitz
+import pandas as pd
+
+# Folder holding this script, the functions script, and the bundled archives
+scriptFolder = os.path.dirname(os.path.abspath(__file__))
+
+############################### SYNTHETIC PDFS ################################
+
+# Words the synthetic documents are written with
+vocabulary = ["river","sediment","flood","channel","levee","wetland","nitrogen","phosphorus",
+              "fish","mussel","habitat","agriculture","runoff","discharge","erosion","navigation",
+              "dam","reservoir","floodplain","hypoxia","nutrient","groundwater","drought",
+              "precipitation","watershed","tributary","stakeholder","policy","restoration",
+              "invasive","carp","barge","lock","bank","vegetation","soil","corn","soybean",
+              "tillage","drainage","tile","monitoring","gauge","stage","hydrograph","delta",
+              "coastal","marsh","subsidence","community","economic","recreation","survey"]
+authors = ["Smith","Johnson","Garcia","Nguyen","Brown","Miller","Davis","Lopez","Wilson","Moore"]
+
+def syntheticSentence(rng):
+    words = [rng.choice(vocabulary) for _ in range(rng.randint(8, 20))]
+    if rng.random() < 0.2:
+        words.insert(rng.randint(1, len(words)), "(" + rng.choice(authors) + " et al., " + str(rng.randint(1990, 2023)) + ")")
+    if rng.random() < 0.15:
+        words.insert(rng.randint(1, len(words)), str(round(rng.uniform(0, 500), 1)) + " m3/s")
+    if rng.random() < 0.05:
+        words.insert(rng.randint(1, len(words)), "défi")
+    return " ".join(words).capitalize() + "."
+
+def syntheticParagraph(rng):
+    return " ".join(syntheticSentence(rng) for _ in range(rng.randint(3, 8)))
+
+def syntheticTable(rng):
+    rows = ["Table " + str(rng.randint(1, 9)) + ". Site measurements"]
+    for site in range(rng.randint(4, 12)):
+        rows.append("Site " + str(site+1) + " " + " ".join(str(round(rng.uniform(0, 100), 2)) for _ in range(4)))
+    return "\n".join(rows)
+
+# Write one synthetic journal article. The same seed always gives the same PDF
+def makeSyntheticPDF(pdfPath, seed):
+    rng = random.Random(seed)
+    numberOfPages = rng.choice([2, 3, 5, 8, 12, 20])
+    document = fitz.open()
+    sections = []
+    if rng.random() < 0.2:
+        sections.append("Contents\n1 Introduction\n2 Methods\n3 Results\n4 References")
+    sections.append("Synthetic Study " + str(seed) + "\nAbstract\n" + syntheticParagraph(rng))
+    sections.append("Introduction\n" + syntheticParagraph(rng))
+    for page in range(numberOfPages - len(sections) - 1):
+        body = [syntheticParagraph(rng) for _ in range(rng.randint(2, 4))]
+        if rng.random() < 0.3:
+            body.insert(rng.randint(0, len(body)), syntheticTable(rng))
+        sections.append("\n".join(body))
+    sections.append("References\n" + "\n".join(rng.choice(authors) + ", A. (" + str(rng.randint(1990, 2023)) + "). "
+                                                + syntheticSentence(rng) + " Journal of " + rng.choice(vocabulary).title()
+                                                + ", " + str(rng.randint(1, 90)) + ", " + str(rng.randint(1, 900)) + "-"
+                                                + str(rng.randint(901, 999)) + "." for _ in range(rng.randint(5, 25))))
+    for number, text in enumerate(sections):
+        page = document.new_page()
+        # Running header and page number, which pdfToText clips off
+        page.insert_text((72, 30), "Journal of Synthetic Hydrology " + str(2000 + seed % 24), fontsize=8)
+        page.insert_text((page.rect.width/2, page.rect.height - 25), str(number + 1), fontsize=8)
+        page.insert_textbox(fitz.Rect(72, 72, page.rect.width - 72, page.rect.height - 72), text, fontsize=9)
+    document.save(pdfPath)
+    document.close()
+
+def makeSyntheticPDFs(folder, documents):
+    pdfPaths = []
+    for seed in range(documents):
+        pdfPath = os.path.join(folder, "Synthetic_" + str(seed) + ".pdf")
+        makeSyntheticPDF(pdfPath, seed)
+        pdfPaths.append(pdfPath)
+    return pdfPaths
+
+############################### SAMPLED REAL PDFS #############################
+
+# A fixed sample of real PDFs from the bundled archives, extracted to the
+# folder. Archives that haven't been downloaded (git LFS pointer files) are
+# skipped
+def sampleZipPDFs(folder, samples, seed=0):
+    pdfPaths = []
+    for archive in sorted(x for x in os.listdir(scriptFolder) if x.startswith("PDFs_") and x.endswith(".zip")):
+        archivePath = os.path.join(scriptFolder, archive)
+        if not zipfile.is_zipfile(archivePath):
+            print("Skipping " + archive + ", which hasn't been downloaded (git lfs pull)")
+            continue
+        with zipfile.ZipFile(archivePath) as zipFile:
+            names = sorted(x for x in zipFile.namelist() if x.lower().endswith(".pdf"))
+            for name in random.Random(seed).sample(names, min(samples, len(names))):
+                pdfPath = os.path.join(folder, os.path.basename(name))
+                with zipFile.open(name) as source, open(pdfPath, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                pdfPaths.append(pdfPath)
+    return pdfPaths
+
+############################## MODEL MATERIALS ################################
+
+# A temporary Model Materials folder for the modeling stages: stopwords and
+# unwanted sections, the Basin-Wide word cloud template, and an empty results
+# folder
+def makeModelMaterials(folder):
+    for dataFile in ["Stopwords.csv", "Unwanted Sections.csv"]:
+        shutil.copy(os.path.join(scriptFolder, dataFile), os.path.join(folder, dataFile))
+    os.makedirs(os.path.join(folder, "Word Cloud Templates"))
+    os.makedirs(os.path.join(folder, "Model Training Results", "Basin-Wide"))
+    templatePath = os.path.join(folder, "Word Cloud Templates", "Basin-Wide.jpg")
+    templates = os.path.join(scriptFolder, "Word Cloud Templates.zip")
+    if zipfile.is_zipfile(templates):
+        with zipfile.ZipFile(templates) as zipFile:
+            name = [x for x in zipFile.namelist() if x.endswith("Basin-Wide.jpg")][0]
+            with zipFile.open(name) as source, open(templatePath, 'wb') as target:
+                shutil.copyfileobj(source, target)
+    else:
+        from PIL import Image
+        Image.new("RGB", (800, 600), "black").save(templatePath)
+    return folder + "/"
+
+################################ TIME THE STAGES ##############################
+
+# Total time of each stage recorded by the functions script's profiling
+def stageTimes(ptm, group):
+    times = {}
+    for event in ptm.stageEvents:
+        name = group + "/" + event["name"]
+        times[name] = times.get(name, 0) + event["dur"]/1e6
+    ptm.stageEvents.clear()
+    return times
+
+# Run the four pre-processing stages over every PDF. Without the NLTK data
+# needed for lemmatization, tokenizeAndRemove can't be timed, and the texts
+# are only lowercased for the modeling stages
+def preprocessPDFs(ptm, pdfPaths, stopwordsFilePath):
+    texts = []
+    lemmatization = True
+    for pdfPath in pdfPaths:
+        with fitz.open(pdfPath) as document:
+            text = ptm.delInsideLines(ptm.delUnwantedLines(ptm.pdfToText(document)))
+        if lemmatization:
+            try:
+                text = ptm.tokenizeAndRemove(text,stopwordsFilePath)
+            except LookupError:
+                print("NLTK WordNet data is missing, so tokenizeAndRemove is not timed")
+                lemmatization = False
+                ptm.stageEvents[:] = [x for x in ptm.stageEvents if x["name"] != "tokenizeAndRemove"]
+        if not lemmatization:
+            text = " ".join(text.lower().split())
+        texts.append(text)
+    return texts
+
+# Run the modeling stages on the pre-processed texts, with every (hyper)
+# parameter calibrated
+def runModelStages(ptm, texts, filepath):
+    import matplotlib.pyplot as plt
+    ptm.presetDecisions.update({"scopeOfTexts": "All", "ngramSize": "2", "removeCommonNgrams": "N",
+                                "useTFIDF": "N", "useDefaultAlpha": "N", "useDefaultEta": "N"})
+    database = pd.DataFrame({"Text ID": range(len(texts)),
+                             "Preprocessed Text": texts,
+                             "Document Title": ["Document " + str(i) for i in range(len(texts))],
+                             "Citations": ["Citation " + str(i) for i in range(len(texts))],
+                             "State(s)": ["Iowa"]*len(texts),
+                             "River/Sub-Basin(s)": ["Upper Mississippi"]*len(texts),
+                             "URL": ["http://example.org/" + str(i) for i in range(len(texts))],
+                             "Year": [1990 + i % 34 for i in range(len(texts))]})
+    ptm.textSelection(database)
+    trainingCorpus = ptm.createCorpus(ptm.textsForTraining,filepath)
+    trainedModel = ptm.trainLDAAlgorithm(trainingCorpus,filepath)
+    ptm.evaluateTrainedModel(trainedModel,filepath)
+    plt.close("all")
+    shutil.rmtree(filepath + "Model Training Results/Basin-Wide")
+    os.makedirs(filepath + "Model Training Results/Basin-Wide")
+
+def runBenchmark(documents, zipSamples, repeats, modelRepeats):
+    import matplotlib
+    matplotlib.use("Agg")
+    sys.path.insert(0, scriptFolder)
+    import Preprocessing_and_Topic_Modeling_Functions as ptm
+    ptm.trainingOptions["profileStages"] = True
+
+    runs = []
+    workFolder = tempfile.mkdtemp(prefix="Pipeline_Benchmark_")
+    try:
+        filepath = makeModelMaterials(workFolder)
+        os.makedirs(os.path.join(workFolder, "Synthetic PDFs"))
+        os.makedirs(os.path.join(workFolder, "Real PDFs"))
+        syntheticPaths = makeSyntheticPDFs(os.path.join(workFolder, "Synthetic PDFs"), documents)
+        realPaths = sampleZipPDFs(os.path.join(workFolder, "Real PDFs"), zipSamples)
+
+        for repeat in range(max(repeats, modelRepeats)):
+            print("\nRepeat " + str(repeat + 1) + ":")
+            times = {}
+            ptm.stageEvents.clear()
+            texts = preprocessPDFs(ptm, syntheticPaths, filepath + "Stopwords.csv")
+            times.update(stageTimes(ptm, "synthetic"))
+            if realPaths:
+                preprocessPDFs(ptm, realPaths, filepath + "Stopwords.csv")
+                times.update(stageTimes(ptm, "zip"))
+            if repeat < modelRepeats:
+                runModelStages(ptm, texts, filepath)
+                times.update(stageTimes(ptm, "model"))
+            runs.append(times)
+    finally:
+        shutil.rmtree(workFolder, ignore_errors=True)
+
+    # Median time of each stage over the repeats it was run in
+    stages = {}
+    for times in runs:
+        for name, seconds in times.items():
+            stages.setdefault(name, []).append(seconds)
+    return {"settings": {"documents": documents, "zipPDFs": len(realPaths), "repeats": repeats,
+                         "modelRepeats": modelRepeats},
+            "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                        "processor": platform.processor(), "cpus": os.cpu_count()},
+            "stages": {name: statistics.median(seconds) for name, seconds in stages.items()}}
+
+########################### COMPARE WITH A BASELINE ###########################
+
+# Print each stage's time next to the baseline's, returning the stages that
+# got slower by more than the tolerance (and by more than minimumSeconds, so
+# that very short stages don't report timing noise)
+def compareWithBaseline(results, baseline, tolerance, minimumSeconds=0.05):
+    regressions = []
+    if baseline["settings"] != results["settings"]:
+        print("\nWarning: the baseline was run with different settings: " + str(baseline["settings"]))
+    print("\n%-45s %10s %10s %8s" % ("Stage", "Baseline", "Now", "Ratio"))
+    for name, seconds in results["stages"].items():
+        if name not in baseline["stages"]:
+            print("%-45s %10s %10.3f" % (name, "-", seconds))
+            continue
+        before = baseline["stages"][name]
+        ratio = seconds/before if before > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance and seconds - before > minimumSeconds:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif ratio < 1 - tolerance and before - seconds > minimumSeconds:
+            flag = "  faster"
+        print("%-45s %10.3f %10.3f %7.2fx%s" % (name, before, seconds, ratio, flag))
+    return regressions
+
+def printResults(results):
+    print("\n%-45s %10s" % ("Stage", "Seconds"))
+    for name, seconds in results["stages"].items():
+        print("%-45s %10.3f" % (name, seconds))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pre-processing and topic modeling stages.")
+    parser.add_argument("--documents", type=int, default=40, help="Number of synthetic PDFs")
+    parser.add_argument("--zipSamples", type=int, default=10, help="Real PDFs sampled from each archive")
+    parser.add_argument("--repeats", type=int, default=3, help="Repeats of the pre-processing stages")
+    parser.add_argument("--modelRepeats", type=int, default=1, help="Repeats of the modeling stages")
+    parser.add_argument("--baseline", help="Baseline results to compare against")
+    parser.add_argument("--saveBaseline", help="Save the results as a baseline to this file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Fraction by which a stage may be slower than the baseline")
+    args = parser.parse_args()
+
+    results = runBenchmark(args.documents, args.zipSamples, args.repeats, args.modelRepeats)
+    if args.saveBaseline:
+        with open(args.saveBaseline, 'w', encoding='utf-8') as fp:
+            json.dump(results, fp, indent=4)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as fp:
+            regressions = compareWithBaseline(results, json.load(fp), args.tolerance)
+        if regressions:
+            print("\n" + str(len(regressions)) + " stages are slower than the baseline")
+            sys.exit(1)
+    else:
+        printResults(results)
@@ -15,31 +15,238 @@
 # socio-environmental system challenges facing of the Mississippi River Basin.
 ###############################################################################
 
-# Necessary modules (some may have to be installed first)
+# Necessary modules (some may have to be installed first). Importing this
+# script has no side effects, and the heavy text-mining, modeling, and
+# visualization modules (nltk, sklearn, gensim, matplotlib, seaborn,
+# networkx, netgraph, wordcloud, PIL) are only imported inside the functions
+# that use them, so that the pre-processing stage and each worker process
+# started for it does not pay for their import
 import csv
 import fitz
-import gensim.corpora as corpora
 import itertools
-import matplotlib.pyplot as plt
-import networkx as nx
 import numpy as np
 import os
 import pandas as pd
 import re
-import seaborn as sns
 import shutil
 import string
-from collections import Counter
-from gensim import models
+import time
+import zipfile
+import zlib
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from types import SimpleNamespace
 from itertools import combinations
-from netgraph import Graph, get_circular_layout, get_bundled_edge_paths
-from nltk.tokenize import WhitespaceTokenizer
-from nltk.stem import WordNetLemmatizer
 from operator import itemgetter
-from PIL import Image
-from sklearn.feature_extraction.text import CountVectorizer
 from tqdm import tqdm
-from wordcloud import WordCloud
+
+# =============================================================================
+#                              END-USER DECISIONS
+# =============================================================================
+
+# Options offered to the user when selecting the texts of interest. The 40
+# regions (30 states, 5 sub-basins, 4 decades, and the whole basin) each have
+# their own folder in Model Training Results
+scopeOptions = ["All","State","Sub-Basin","Decade"]
+stateOptions = ["Alabama","Arkansas","Colorado","Georgia","Illinois","Indiana",
+                "Iowa","Kansas","Kentucky","Louisiana","Maryland","Minnesota",
+                "Mississippi","Missouri","Montana","Nebraska","New Mexico",
+                "New York","North Carolina","North Dakota","Ohio","Oklahoma",
+                "Pennsylvania","South Dakota","Tennessee","Texas","Virginia",
+                "Westvirginia","Wisconsin","Wyoming"]
+subBasinOptions = ["Arkansas-Red","Lower Mississippi","Missouri (Basin)",
+                   "Ohio (Basin)","Upper Mississippi"]
+decadeOptions = ["1990s","2000s","2010s","2020s"]
+
+# Decisions can be supplied ahead of time (e.g. by Batch_Function_Calls) by
+# adding them to this dictionary, keyed by the name of the user input they
+# answer ("preprocessText", "ngramSize", "useTFIDF", etc.). Any decision not
+# found here is asked for as usual
+presetDecisions = {}
+
+# Every user input in this script goes through this function, which returns 
+# the preset decision if one was given and otherwise keeps asking the user
+# until a valid value is entered
+def askUser(decision,values,message):
+    if decision in presetDecisions:
+        x = str(presetDecisions[decision])
+        if x in values:
+            return x
+        raise ValueError("Invalid preset value for " + decision + ": options are " + str(values))
+    while True:
+        x = input(message)
+        if x in values:
+            return x
+        else:
+            print("Invalid value: options are " + str(values))
+
+# Optional settings for training the LDA algorithm that are not asked for with
+# user inputs, but can be changed here or by Batch_Function_Calls:
+#   ldaWorkers: number of worker processes that the E-step of every LDA fit
+#               (calibration and final) is split across; 1 trains serially
+#   compareSerial: also train the final model serially (with the same early
+#                  stopping settings) and report the speedup
+#   earlyStopping: stop LDA fits of more than one pass (the final model) once
+#                  they have converged. Fits of one pass (every calibration
+#                  fit) can't stop after a pass, so documentTolerance instead
+#                  ends the E-step iterations over each document sooner
+#   convergenceMetric: "drift" (largest change of any topic's n-gram
+#                      probabilities) or "perplexity" (relative change of the
+#                      per-word likelihood bound) between passes
+#   tolerance: change below which a pass counts as converged
+#   patience: number of converged passes in a row needed to stop
+#   documentTolerance: with earlyStopping, the mean change of a document's
+#                      topic weights below which its E-step iterations end
+#                      in fits of one pass (gensim's gamma_threshold, which
+#                      is 0.001 without early stopping)
+#   warmStart: start each fit of the number of topics, alpha and eta sweeps
+#              from the topics of the nearest value already evaluated
+#   densityTolerance: when a saved model is updated with new documents, the
+#                     largest expected change of a document's densities for
+#                     its saved densities to be kept
+#   recalibrationDrift: topic drift of an update above which the model should
+#                       be calibrated and trained again from scratch
+#   profileStages: record the time and memory taken by every stage function
+#                  (see STAGE PROFILING below)
+#   pageWorkers: number of worker processes that the pages of a large PDF
+#                are split across by pdfToText; 1 extracts every PDF serially
+#   pagesPerRange: PDFs with more pages than this are split into page ranges
+#                  of this many pages when pageWorkers is above 1
+#   skipTablesAndFigures: leave out the text of tables, figures, and their
+#                         captions when extracting each page, found from the
+#                         layout of the page (see pageText)
+#   tokenStore: keep the pre-processed texts as arrays of token IDs next to
+#               the Document Details database, and build n-grams from them
+#               (see PRE-PROCESSED TOKEN STORE below)
+#   minDocumentFrequency: n-grams in fewer documents than this are pruned from
+#                         the training corpus (see PRUNE THE VOCABULARY below)
+#   maxDocumentFraction: n-grams in more than this fraction of the documents
+#                        are pruned
+#   keepTopNgrams: keep only this many of the n-grams in the most documents
+#                  (0 keeps them all)
+#   maxNgramsPerOrder: keep only this many of the n-grams of each order in the
+#                      most documents, e.g. {"2": 20000, "3": 5000}
+#   comparePruning: also train the final model on the unpruned vocabulary and
+#                   report its training time and coherence
+#   nearDuplicates: "keep" every text, or "exclude" all but the first of each
+#                   cluster of near-duplicate texts, or "downweight" them so
+#                   each cluster weighs as much as one text (see
+#                   NEAR-DUPLICATE TEXTS below)
+#   duplicateSimilarity: estimated share of shingles two texts must have in
+#                        common to be near-duplicates
+#   shingleSize: number of words in each shingle
+trainingOptions = {"ldaWorkers": 1,
+                   "compareSerial": False,
+                   "earlyStopping": False,
+                   "convergenceMetric": "drift",
+                   "tolerance": 0.001,
+                   "patience": 3,
+                   "documentTolerance": 0.01,
+                   "warmStart": False,
+                   "densityTolerance": 0.01,
+                   "recalibrationDrift": 0.2,
+                   "profileStages": False,
+                   "pageWorkers": 1,
+                   "pagesPerRange": 50,
+                   "skipTablesAndFigures": False,
+                   "tokenStore": False,
+                   "minDocumentFrequency": 1,
+                   "maxDocumentFraction": 1.0,
+                   "keepTopNgrams": 0,
+                   "maxNgramsPerOrder": {},
+                   "comparePruning": False,
+                   "nearDuplicates": "keep",
+                   "duplicateSimilarity": 0.8,
+                   "shingleSize": 5}
+
+############################### STAGE PROFILING ###############################
+
+# While trainingOptions["profileStages"] is set, every stage function (from
+# pdfToText, called once per PDF, through to wordWebs) records its wall time,
+# CPU time, the peak memory of the process so far, and how many items
+# (pages, lines, words, documents) it was given. writeTextFile summarizes the
+# stages recorded since the previous model run's outputs were written, and
+# saves them as a Chrome trace (Stage Profile.json, which can be opened in
+# chrome://tracing or ui.perfetto.dev). Times of a stage include those of the
+# stages it calls
+stageEvents = []
+profiledDocument = None
+profileStart = time.perf_counter()
+
+# Peak resident memory of this process in MB, or None where it can't be read
+def peakMemory():
+    import sys
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss) / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # (bytes on macOS, kB elsewhere)
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+# Decorator marking a stage function for profiling. items counts what the
+# stage was given and detail names which call of the stage it is, both from
+# the stage's arguments. document gives the name of the PDF a pre-processing
+# stage starts on, and later stages with perDocument set are recorded for it
+def profiled(stage, items=None, detail=None, document=None, perDocument=False):
+    def decorator(function):
+        @wraps(function)
+        def profiledFunction(*args, **kwargs):
+            if not trainingOptions["profileStages"]:
+                return function(*args, **kwargs)
+            global profiledDocument
+            eventArgs = {}
+            if document is not None:
+                profiledDocument = document(*args, **kwargs)
+            if document is not None or perDocument:
+                eventArgs["document"] = profiledDocument
+            if items is not None:
+                eventArgs["items"] = items(*args, **kwargs)
+            name = stage if detail is None else stage + " (" + str(detail(*args, **kwargs)) + ")"
+            startWall = time.perf_counter()
+            startCPU = time.process_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                eventArgs["cpuSeconds"] = time.process_time() - startCPU
+                eventArgs["peakMemoryMB"] = peakMemory()
+                stageEvents.append({"name": name, "cat": "stage", "ph": "X",
+                                    "ts": (startWall - profileStart)*1e6,
+                                    "dur": (time.perf_counter() - startWall)*1e6,
+                                    "pid": os.getpid(), "tid": 0, "args": eventArgs})
+        return profiledFunction
+    return decorator
+
+# One line per stage of the recorded profile, in the order the stages first
+# ran: calls, wall time, CPU time, items, and peak memory
+def profileSummary():
+    stages = {}
+    for event in stageEvents:
+        stage = stages.setdefault(event["name"], {"calls": 0, "wall": 0, "cpu": 0, "items": None, "memory": 0})
+        stage["calls"] += 1
+        stage["wall"] += event["dur"]/1e6
+        stage["cpu"] += event["args"]["cpuSeconds"]
+        if "items" in event["args"]:
+            stage["items"] = (stage["items"] or 0) + event["args"]["items"]
+        stage["memory"] = max(stage["memory"], event["args"]["peakMemoryMB"] or 0)
+    return ["%s: %d calls, %.2f s wall, %.2f s CPU, %s%.0f MB peak memory"
+            % (name, stage["calls"], stage["wall"], stage["cpu"],
+               "" if stage["items"] is None else str(stage["items"]) + " items, ", stage["memory"])
+            for name, stage in stages.items()]
+
+# Save the recorded profile as a Chrome trace and start recording afresh
+def writeStageTrace(tracePath):
+    import json
+    with open(tracePath, 'w', encoding='utf-8') as file:
+        json.dump({"traceEvents": stageEvents, "displayTimeUnit": "ms"}, file)
+    stageEvents.clear()
 
 # =============================================================================
 #                         PRE-PROCESSING FUNCTIONS
@@ -50,16 +257,8 @@ from wordcloud import WordCloud
 # User is asked whether to pre-process any text first, or progress
 # immediately to topic modeling
 def preprocessText(values,message):
-    while True:
-        x = input(message)
-        if x in values:
-            preprocessText.yesNo = x
-            break
-        else:
-            print("Invalid value: options are " + str(values))
+    preprocessText.yesNo = askUser("preprocessText",values,message)
     return preprocessText
-preprocessText(["Y","N"],'''\nWould you like to pre-process the PDFs first '''
-               '''before topic modeling them? (Y/N): \n''')
 
 ########################### CREATE PDF FILE LIST ##############################
 
@@ -70,13 +269,7 @@ def pdfFileList(databaseFilepath):
     # User input for whether pre-processing is performed on all or only new PDFs
     # IMPORTANT: Document details must be added to the database first!!!!
     def preprocessNewOnly(values,message):
-        while True:
-            x = input(message)
-            if x in values:
-                preprocessNewOnly.yesNo = x
-                break
-            else:
-                print("Invalid value: options are " + str(values))
+        preprocessNewOnly.yesNo = askUser("preprocessNewOnly",values,message)
         return preprocessNewOnly
     preprocessNewOnly(["Y","N"],'''\nWould you like to only pre-process texts '''
                   '''that you haven't added to the database yet? (Y/N): \n''')
@@ -104,21 +297,206 @@ def pdfFileList(databaseFilepath):
         
     return fileList
 
+############################ PDF DOCUMENT SOURCE ##############################
+
+# The PDFs are distributed as PDFs_1_of_3.zip to PDFs_3_of_3.zip, and are read
+# straight from those archives (kept in the Model Materials folder) rather
+# than being extracted first. The central directory of each archive is read
+# once, giving the archive and entry of every PDF by its file name. A PDF that
+# has been extracted to filepath + "PDFs/" is read from there instead
+pdfArchives = {}
+
+def pdfArchiveIndex(filepath):
+    if filepath not in pdfArchives:
+        index = {}
+        archives = sorted(x for x in os.listdir(filepath) if x.startswith("PDFs_") and x.endswith(".zip"))
+        for archive in archives:
+            # Archives not yet downloaded from git LFS are only pointer files
+            if not zipfile.is_zipfile(filepath + archive):
+                continue
+            with zipfile.ZipFile(filepath + archive) as zipFile:
+                for member in zipFile.infolist():
+                    if not member.is_dir() and member.filename.lower().endswith(".pdf"):
+                        index.setdefault(os.path.basename(member.filename), (filepath + archive, member))
+        pdfArchives[filepath] = index
+    return pdfArchives[filepath]
+
+# Open each PDF in fileList in turn, yielding its file name and fitz document.
+# A background thread reads the next few PDFs from the archives (or the PDFs
+# folder) while the current one is being converted and cleaned, so reading
+# overlaps with pre-processing. Documents are opened from memory but keep
+# their file name
+def pdfDocuments(filepath, fileList, prefetch=4):
+    index = pdfArchiveIndex(filepath)
+    openArchives = {}
+
+    # Only ever called from the reader thread, so each archive is opened once
+    def readPDF(file):
+        if os.path.exists(filepath + "PDFs/" + file):
+            with open(filepath + "PDFs/" + file, 'rb') as fp:
+                return fp.read()
+        if file not in index:
+            raise FileNotFoundError(file + " is in neither " + filepath + "PDFs/ nor the PDFs_*.zip archives")
+        archivePath, member = index[file]
+        if archivePath not in openArchives:
+            openArchives[archivePath] = zipfile.ZipFile(archivePath)
+        return openArchives[archivePath].read(member)
+
+    files = iter(fileList)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            pending = deque((file, reader.submit(readPDF, file)) for file in itertools.islice(files, prefetch))
+            while pending:
+                file, data = pending.popleft()
+                for nextFile in itertools.islice(files, 1):
+                    pending.append((nextFile, reader.submit(readPDF, nextFile)))
+                yield file, fitz.open(file, data.result())
+    finally:
+        for zipFile in openArchives.values():
+            zipFile.close()
+
 ########################## PDF TO TEXT CONVERSION ############################
 
+# Captions of tables and figures, which start a block of text on the page.
+# Blocks longer than a caption could be are main text that happens to follow
+# a caption line, so only their first line is left out
+captionPattern = re.compile(r'\s*(Fig\.|Figure|FIGURE|Table|TABLE|Plate|PLATE)\s*[0-9IVX]+\b')
+captionLines = 6
+
+def withoutCaption(block):
+    if not captionPattern.match("".join(span["text"] for span in block["lines"][0]["spans"])):
+        return block["lines"]
+    return [] if len(block["lines"]) <= captionLines else block["lines"][1:]
+
+# Areas of a page covered by figures: images, and clusters of vector drawings
+# (charts, maps, and table rules). Drawings covering most of the page, such as
+# page borders and background shading, are not figures
+def figureAreas(page):
+    areas = [fitz.Rect(image["bbox"]) for image in page.get_image_info()]
+    if hasattr(page, "cluster_drawings"):
+        drawings = page.cluster_drawings()
+    else:
+        drawings = [drawing["rect"] for drawing in page.get_drawings()]
+    areas += [rect for rect in drawings if rect.get_area() < 0.5*page.rect.get_area()]
+    return [rect for rect in areas if not rect.is_empty]
+
+# Horizontal rules drawn on a page, such as the lines above and below the rows
+# of a table
+def rulingLines(page):
+    return [drawing["rect"] for drawing in page.get_drawings()
+            if drawing["rect"].height <= 2 and drawing["rect"].width > 20]
+
+# Table cells are numbers (measurements, percentages, ranges) or a word or
+# two, shorter than even a narrow column of prose fills
+numericCell = re.compile(r'[\W\d_]*\d[\W\d_]*')
+cellCharacters = 20
+
+def shortCell(line):
+    text = "".join(span["text"] for span in line["spans"]).strip()
+    return numericCell.fullmatch(text) is not None or len(text) <= cellCharacters
+
+# Text lines of a page that are cells of a table: lines sharing a baseline
+# with at least two other lines spaced apart from each other across the page,
+# if most of them are short or numeric cells or the row has a rule just above
+# or below it. Columns of prose also share baselines, but their lines are
+# long and not ruled
+def tableLines(lines, rulings=()):
+    rows = {}
+    for line in lines:
+        rows.setdefault(round(line["bbox"][3]), []).append(line)
+    cells = set()
+    for row in rows.values():
+        row.sort(key=lambda line: line["bbox"][0])
+        separate = [row[0]] + [line for before, line in zip(row, row[1:]) if line["bbox"][0] - before["bbox"][2] > 5]
+        if len(separate) < 3:
+            continue
+        left, right = row[0]["bbox"][0], max(line["bbox"][2] for line in row)
+        top, bottom = min(line["bbox"][1] for line in row), max(line["bbox"][3] for line in row)
+        ruled = any(rule.x0 <= left + 5 and rule.x1 >= right - 5
+                    and (abs(rule.y1 - top) <= bottom - top or abs(rule.y0 - bottom) <= bottom - top)
+                    for rule in rulings)
+        if ruled or 2*sum(shortCell(line) for line in row) > len(row):
+            cells.update(id(line) for line in row)
+    return cells
+
+# Text of a single page of a PDF
+def pageText(page, skipTablesAndFigures=False):
+    # Headers and footers also deleted based on falling outside each
+    # page's bounding box
+    rect = page.rect
+    height = 50
+    clip = fitz.Rect(20, height, rect.width-20, rect.height-height)
+    if not skipTablesAndFigures:
+        return page.get_text(clip=clip, flags=fitz.TEXT_PRESERVE_LIGATURES)
+
+    # Otherwise the layout of the page is used to leave out caption blocks,
+    # lines inside figures, and table cells, and the remaining lines are
+    # written out in the same way as the plain text above
+    blocks = page.get_text("dict", clip=clip, flags=fitz.TEXT_PRESERVE_LIGATURES)["blocks"]
+    blocks = [block for block in blocks if block["type"] == 0 and block["lines"]]
+    areas = figureAreas(page)
+    lines = [line for block in blocks for line in withoutCaption(block)
+             if not any((fitz.Rect(line["bbox"]) & area).get_area() > 0.5*fitz.Rect(line["bbox"]).get_area()
+                        for area in areas)]
+    cells = tableLines(lines, rulingLines(page))
+    return "".join("".join(span["text"] for span in line["spans"]) + "\n" for line in lines if id(line) not in cells)
+
+# The worker processes that the page ranges of large PDFs are split across,
+# started on first use and kept for every later PDF
+pageWorkerPool = None
+pageWorkerCount = 0
+
+def getPageWorkerPool(workers):
+    global pageWorkerPool, pageWorkerCount
+    if pageWorkerPool is None or pageWorkerCount != workers:
+        import atexit
+        import multiprocessing
+        if pageWorkerPool is not None:
+            pageWorkerPool.terminate()
+        pageWorkerPool = multiprocessing.Pool(workers)
+        pageWorkerCount = workers
+        atexit.register(pageWorkerPool.terminate)
+    return pageWorkerPool
+
+# Run in a worker process: open the PDF file with its own fitz handle and
+# extract the text of pages start to stop
+def pageRangeTexts(pdfPath, start, stop, skipTablesAndFigures):
+    with fitz.open(pdfPath) as document:
+        return [pageText(document[i], skipTablesAndFigures) for i in range(start, stop)]
+
+# Text of every page of a PDF. PDFs with more than
+# trainingOptions["pagesPerRange"] pages are split into page ranges extracted
+# by trainingOptions["pageWorkers"] worker processes, and the page texts are
+# put back in order. Each worker opens the PDF's file itself, so only its path
+# is sent to the workers; a PDF opened from memory (e.g. read from an archive)
+# is written once to a temporary file for them
+def pageTexts(fileToConvert):
+    workers = int(trainingOptions["pageWorkers"])
+    pagesPerRange = int(trainingOptions["pagesPerRange"])
+    skipTablesAndFigures = bool(trainingOptions["skipTablesAndFigures"])
+    pageCount = fileToConvert.page_count
+    if workers <= 1 or pageCount <= pagesPerRange:
+        return [pageText(page, skipTablesAndFigures) for page in fileToConvert]
+    pdfPath, temporaryPath = fileToConvert.name, None
+    if fileToConvert.stream is not None:
+        import tempfile
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as fp:
+            fp.write(fileToConvert.stream)
+        pdfPath = temporaryPath = fp.name
+    try:
+        ranges = [(pdfPath, start, min(start + pagesPerRange, pageCount), skipTablesAndFigures)
+                  for start in range(0, pageCount, pagesPerRange)]
+        return [text for texts in getPageWorkerPool(workers).starmap(pageRangeTexts, ranges) for text in texts]
+    finally:
+        if temporaryPath is not None:
+            os.remove(temporaryPath)
+
 # The original PDF file must be converted into text
+@profiled("pdfToText", items=len, document=lambda fileToConvert: os.path.basename(fileToConvert.name))
 def pdfToText(fileToConvert):
-    pdfPages = []
-    # Iterate through each page in the document
-    for page in fileToConvert:
-        # Headers and footers also deleted based on falling outside each
-        # page's bounding box
-        rect = page.rect
-        height = 50
-        clip = fitz.Rect(20, height, rect.width-20, rect.height-height)
-        # Extract the text from each page and add to the empty pdfPages list
-        text = page.get_text(clip=clip, flags=fitz.TEXT_PRESERVE_LIGATURES)
-        pdfPages.append(text)
+    # Extract the text from each page in the document (in page ranges across
+    # worker processes if the document is large enough)
+    pdfPages = pageTexts(fileToConvert)
     # List of page indices
     pageNumbers = list(range(len(pdfPages)))
     
@@ -417,6 +795,7 @@ def pdfToText(fileToConvert):
 # text content must be deleted. Examples include table rows, stray 
 # letters/numbers/characters on their own lines, empty lines, and errors in
 # PDF to text extraction
+@profiled("delUnwantedLines", items=len, perDocument=True)
 def delUnwantedLines(extractedText):
     
     # Delete leading and trailing whitespace from each line first
@@ -501,54 +880,124 @@ def delUnwantedLines(extractedText):
 
 ########################### DELETE TEXT INSIDE LINES ##########################
 
+# Numbers and text inside parentheses on the same line are deleted by one
+# compiled substitution. Deleting the numbers first and then the text inside
+# parentheses (as these functions originally did) gives the same result,
+# because numbers never contain parentheses
+numbersAndParentheses = re.compile(r'\([^)]*\)|[0-9]+')
+# Anything that isn't a Latin character, period, hyphen, or whitespace
+nonLatinCharacters = re.compile(r'[^a-zA-Z .-]')
+
+# Numbers and text inside parentheses are deleted from a single line
+def cleanLine(line):
+    line = numbersAndParentheses.sub('', line)
+    # Parentheses often stretch across lines, so delete everything before a
+    # closing parenthesis and after an opening one
+    if ")" in line:
+        line = line.split(")", 2)[1]
+    if "(" in line:
+        line = line.split("(", 1)[0]
+    return line
+
+# Hyphens at the end of lines almost always represent a single word written
+# across two lines. Each time this happens, the two lines are joined
+# together and the hyphen is deleted. Ignore floating hyphens. The lines are
+# joined in a single pass, giving the same result as the original loop over
+# the list, which found the lines to join by value: when the hyphenated line
+# or the line after it repeats an earlier line, that earlier line is the one
+# joined or deleted, so the original steps are followed for those lines
+def joinHyphenatedLines(extractedText):
+    joinedText = []
+    counts = Counter()
+    lines = iter(extractedText)
+    for line in lines:
+        if line.endswith("-") and not line.endswith(" -"):
+            nextLine = next(lines, None)
+            if counts[line] == 0 and (nextLine is None or counts[nextLine] == 0):
+                # Don't attempt if the final line of the main text ends with
+                # a hyphen
+                if nextLine is not None:
+                    line = line[:-1] + nextLine
+            else:
+                joinedText.append(line)
+                counts[line] += 1
+                if nextLine is not None:
+                    joinedText.append(nextLine)
+                    counts[nextLine] += 1
+                index = joinedText.index(line)
+                counts[joinedText[index]] -= 1
+                joinedText[index] = joinedText[index][:-1] + joinedText[index+1]
+                counts[joinedText[index]] += 1
+                counts[joinedText[index+1]] -= 1
+                joinedText.remove(joinedText[index+1])
+                continue
+        joinedText.append(line)
+        counts[line] += 1
+    return joinedText
+
 # Parts of text inside each line are now deleted too. This includes numbers,
 # text inside parentheses, and any remaining unwanted text
+@profiled("delInsideLines", items=len, perDocument=True)
 def delInsideLines(extractedText):
     
-    # All numbers in each line are deleted first
-    extractedText = [re.sub(r'[0-9]+', '', line) for line in extractedText]
-    
-    # All text inside parentheses is deleted next
-    extractedText = [re.sub('\(.*?\)','', line) for line in extractedText]
-    # Parentheses often stretch across lines, so delete everything before a
-    # closing parenthesis
-    for i in range(len(extractedText)):
-        if ")" in extractedText[i]:
-            extractedText[i] = extractedText[i].split(")")[1]
-        if "(" in extractedText[i]:
-            extractedText[i] = extractedText[i].split("(")[0]
-  
-    # Hyphens at the end of lines almost always represent a single word written
-    # across two lines. Each time this happens, the two lines are joined
-    # together and the hyphen is deleted. Ignore floating hyphens.
-    for line in extractedText:
-        if line.endswith("-") and not line.endswith(" -"):
-            index = extractedText.index(line)
-            try:
-               extractedText[index] = extractedText[index][:-1] + extractedText[index+1]
-               extractedText.remove(extractedText[index+1])
-            # Don't attempt if the final line of the main text ends with a hyphen
-            except:
-                break
+    # All numbers and text inside parentheses in each line are deleted first,
+    # and lines broken by a hyphen are joined back together
+    extractedText = joinHyphenatedLines([cleanLine(line) for line in extractedText])
 
     # Any text in each line that isn't a Latin character, period, hyphen, or 
-    # whitespace is deleted
-    extractedText = [re.sub(r'[^a-zA-Z .-]', '', line) for line in extractedText]
-    
-    # Delete any remaining lines that are a repeat of another line in the text;
-    # this particularly targets repeating table rows once numbers and text in
-    # parentheses have been removed
-    extractedText = [line for line,elem in itertools.groupby(extractedText)]
-    extractedText = '\n'.join(extractedText)    
+    # whitespace is deleted, and any line that is a repeat of the line before
+    # it is deleted; this particularly targets repeating table rows once
+    # numbers and text in parentheses have been removed
+    cleanedText = []
+    previous = None
+    for line in extractedText:
+        line = nonLatinCharacters.sub('', line)
+        if line != previous:
+            cleanedText.append(line)
+            previous = line
     
-    return extractedText
+    return '\n'.join(cleanedText)
 
 ########################### TOKENIZE AND REMOVE ###############################
 
+# Sentences starting with any of the words in Unwanted Sections.csv (one per
+# row, kept with Stopwords.csv, or with this script if it isn't there) are
+# from unwanted sections. The words are built into a prefix tree, written as
+# one regular expression anchored at the start of each sentence, so that a
+# sentence is checked in a single pass over its first few characters however
+# many words there are. Compiled once per file and kept for later documents
+unwantedSectionPatterns = {}
+
+def prefixTreePattern(tree):
+    # A word ending here means any longer word is already covered
+    if "" in tree:
+        return ""
+    branches = [re.escape(character) + prefixTreePattern(subtree) for character, subtree in sorted(tree.items())]
+    return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+def unwantedSectionPattern(stopwordsFilePath):
+    sectionsFilePath = os.path.join(os.path.dirname(stopwordsFilePath), "Unwanted Sections.csv")
+    if not os.path.exists(sectionsFilePath):
+        sectionsFilePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Unwanted Sections.csv")
+    if sectionsFilePath not in unwantedSectionPatterns:
+        tree = {}
+        with open(sectionsFilePath, 'r', encoding = 'utf-8') as fp:
+            for row in csv.reader(fp):
+                if row and row[0]:
+                    node = tree
+                    for character in row[0]:
+                        node = node.setdefault(character, {})
+                    node[""] = {}
+        unwantedSectionPatterns[sectionsFilePath] = re.compile(prefixTreePattern(tree) if tree else "(?!)")
+    return unwantedSectionPatterns[sectionsFilePath]
+
 # By first defining new lines by sentences and then tokenizing the text, other
 # undesired lines and words can be removed, such as stopwords, in-text 
 # citations, people's names, and remaining unwanted sections.
+@profiled("tokenizeAndRemove", items=lambda extractedText, stopwordsFilePath: len(extractedText.split()), perDocument=True)
 def tokenizeAndRemove(extractedText,stopwordsFilePath):
+    from nltk.tokenize import WhitespaceTokenizer
+    from nltk.stem import WordNetLemmatizer
     
     # Split text on periods instead of new line characters, so each list
     # element is now a sentence from the main text
@@ -564,43 +1013,10 @@ def tokenizeAndRemove(extractedText,stopwordsFilePath):
     extractedText = [line for line in extractedText if not len(line) <= 4]
     
     # Delete sentences that start with a specific word(s) that represents an
-    # unwanted section that still exists in the main text
-    extractedText = [line for line in extractedText if not line.startswith("All authors have read and agreed")
-                      and not line.startswith("All rights reserved")
-                      and not line.startswith("ARTICLE HISTORY")
-                      and not line.startswith("Author Contributions")
-                      and not line.startswith("BioOne sees sustainable")
-                      and not line.startswith("Citation")
-                      and not line.startswith("Commercial inquiries")
-                      and not line.startswith("Contents list available")
-                      and not line.startswith("Correspondence to")
-                      and not line.startswith("Corresponding author")
-                      and not line.startswith("Data Availability Statement")
-                      and not line.startswith("Declaration of Competing Interest")
-                      and not line.startswith("Declaration of conflicting interest")
-                      and not line.startswith("Funding")
-                      and not line.startswith("Full Terms")
-                      and not line.startswith("Informed Consent Statement")
-                      and not line.startswith("Institutional Review Board")
-                      and not line.startswith("Journal of")
-                      and not line.startswith("Key Points")
-                      and not line.startswith("KEY WORDS")
-                      and not line.startswith("Key Words")
-                      and not line.startswith("Key words")
-                      and not line.startswith("Keywords")
-                      and not line.startswith("No part of this periodical")
-                      and not line.startswith("Open Access")
-                      and not line.startswith("Page number")
-                      and not line.startswith("Posted online")
-                      and not line.startswith("Published in")
-                      and not line.startswith("Published online")
-                      and not line.startswith("Submit your article")
-                      and not line.startswith("Supplemental Material")
-                      and not line.startswith("SUPPLEMENTARY MATERIAL")
-                      and not line.startswith("Supplementary Information")
-                      and not line.startswith("Supporting information")
-                      and not line.startswith("This manuscript was submitted on")
-                      and not line.startswith("Your use of this PDF")]
+    # unwanted section that still exists in the main text. The words are read
+    # from Unwanted Sections.csv (see unwantedSectionPattern)
+    unwantedSections = unwantedSectionPattern(stopwordsFilePath)
+    extractedText = [line for line in extractedText if not unwantedSections.match(line)]
  
     # Rejoin and then tokenize the text
     extractedText = ' '.join(extractedText) 
@@ -662,6 +1078,7 @@ def tokenizeAndRemove(extractedText,stopwordsFilePath):
 
 # Once the text has been pre-processed, it must be added to the Preprocessed
 # Text column in the Document Details database
+@profiled("appendAndSave", items=lambda savedDatabase, finalTexts: len(finalTexts))
 def appendAndSave(savedDatabase,finalTexts):
 
     # If pre-processing all documents, blank list elements must be added to the 
@@ -679,6 +1096,15 @@ def appendAndSave(savedDatabase,finalTexts):
     database["Preprocessed Text"] = finalTexts
     database.to_excel(savedDatabase)
     
+    # Save the token IDs of the texts as well, if asked to
+    global tokenStore
+    if trainingOptions["tokenStore"]:
+        tokenStore = openTokenStore(savedDatabase, database)
+    # Add the MinHash signatures of the new texts, if near-duplicates are used
+    global nearDuplicateIndex
+    if trainingOptions["nearDuplicates"] != "keep":
+        nearDuplicateIndex = openNearDuplicateIndex(savedDatabase, database)
+    
     return database
 
 # =============================================================================
@@ -689,16 +1115,24 @@ def appendAndSave(savedDatabase,finalTexts):
 
 # If the user decides to work with the Document Details database without any 
 # new pre-processing, the database is opened as is, as a pandas dataframe
+@profiled("openDocumentDetails")
 def openDocumentDetails(filepath):
     # The database must be assigned as a global variable if accessed without
     # pre-processing first as well
-    global database
+    global database, tokenStore, nearDuplicateIndex
     database = pd.read_excel(filepath, index_col = 0)
+    # Open (or build) the token IDs of the texts as well, if asked to
+    if trainingOptions["tokenStore"]:
+        tokenStore = openTokenStore(filepath, database)
+    # Same for the MinHash signatures of the texts
+    if trainingOptions["nearDuplicates"] != "keep":
+        nearDuplicateIndex = openNearDuplicateIndex(filepath, database)
     return database
 
 ######################## SETTING UP THE TEXT SELECTION ########################
 
 # The desired texts for topic modeling must be selected by the user
+@profiled("textSelection", items=len)
 def textSelection(database):
     
     # This list will be filled with indices of database rows corresponding to 
@@ -707,14 +1141,8 @@ def textSelection(database):
     
     # First ask whether user wants all texts or a specific state/sub-basin/decade.
     def scopeOfTexts(values,message):
-        while True:
-            x = input(message)
-            if x in values:
-                scopeOfTexts.scope = x
-                break
-            else:
-                print("Invalid value: options are " + str(values))
-    scopeOfTexts(["All","State","Sub-Basin","Decade"],'''\nSpecify desired scope '''
+        scopeOfTexts.scope = askUser("scopeOfTexts",values,message)
+    scopeOfTexts(scopeOptions,'''\nSpecify desired scope '''
                   '''of texts (All, State, Sub-Basin, Decade): \n''')
     
     # Make the selected texts a global variable for building word clouds later
@@ -723,23 +1151,12 @@ def textSelection(database):
     # A second user input specifies which specifc state, sub-basin, or decade is
     # of interest for running the topic model
     def textsOfInterest(values,message):
-        while True:
-            x = input(message)
-            if x in values:
-                textsOfInterest.texts = x
-                break
-            else:
-                print("Invalid value: options are " + str(values))
+        textsOfInterest.texts = askUser("textsOfInterest",values,message)
     
     # Specific argument for the second user input, and collection of corresponding
     # indices from the database. First for when the input is "State"
     if scopeOfTexts.scope == "State":
-        textsOfInterest(["Alabama","Arkansas","Colorado","Georgia","Illinois","Indiana",
-                         "Iowa","Kansas","Kentucky","Louisiana","Maryland","Minnesota",
-                         "Mississippi","Missouri","Montana","Nebraska","New Mexico",
-                         "New York","North Carolina","North Dakota","Ohio","Oklahoma",
-                         "Pennsylvania","South Dakota","Tennessee","Texas","Virginia",
-                         "Westvirginia","Wisconsin","Wyoming"], 
+        textsOfInterest(stateOptions,
                          '''\nSpecify desired state (Alabama, Arkansas, Colorado, '''
                          '''Georgia, Illinois, Indiana, Iowa, Kansas, Kentucky, '''
                          '''Louisiana, Maryland, Minnesota, Mississippi, Missouri, '''
@@ -757,8 +1174,7 @@ def textSelection(database):
     # Same again but if the input is "Sub-Basin". Must account for there also
     # being two states named "Missouri" and "Ohio" in the user input
     elif scopeOfTexts.scope == "Sub-Basin":
-        textsOfInterest(["Arkansas-Red","Lower Mississippi","Missouri (Basin)",
-                         "Ohio (Basin)","Upper Mississippi"],
+        textsOfInterest(subBasinOptions,
                         '''\nSpecify desired sub-basin (Arkansas-Red, Lower Mississippi, '''
                         '''Missouri (Basin), Ohio (Basin), Upper Mississippi): \n''')
         
@@ -770,7 +1186,7 @@ def textSelection(database):
     # If the input is "Decade", the database is indexed for all years that fall
     # within each decade
     elif scopeOfTexts.scope == "Decade":
-        textsOfInterest(["1990s","2000s","2010s","2020s"],
+        textsOfInterest(decadeOptions,
                         '\nSpecify desired decade (1990s, 2000s, 2010s, 2020s): \n''')
         
         # The 1990s
@@ -829,10 +1245,18 @@ def textSelection(database):
     # Pre-processing can sometimes remove all main text, leaving np.nan in the
     # "Preprocessed Text" column. Remove these rows from the dataframe
     database = database[database["Preprocessed Text"].notna()]
-
-    # Extract the desired text from the database
-    global textsForTraining
+    
+    # Exclude or down-weight near-duplicate texts, if asked to
+    global duplicateClusters, documentWeights
+    duplicateClusters, documentWeights = [], None
+    if trainingOptions["nearDuplicates"] != "keep":
+        database, duplicateClusters, documentWeights = handleNearDuplicates(database)
+
+    # Extract the desired text from the database, keeping the database indices
+    # of the selected rows for slicing a shared corpus (see buildSharedCorpus)
+    global textsForTraining, selectedIndices
     textsForTraining = database["Preprocessed Text"].tolist()
+    selectedIndices = database.index.tolist()
 
     # Will also need titles, citations, state/basin domains, and URLs for 
     # constructing the document-topic density table in a later function
@@ -846,11 +1270,537 @@ def textSelection(database):
     # Need to be able to access the selected text
     return textsForTraining
 
+############################# N-GRAMS OF ONE TEXT #############################
+
+# The 150 commonest ngrams in all 2,158 PDFs. These words potentially
+# conceal spatiotemporally distinct research priorities, so the user may
+# choose to remove them from the training corpus
+commonestToRemove = ["river","water","area","high","low","large","data",
+                     "time","increase","result","analysis","year","system",
+                     "range","great","occur","change","indicate","level",
+                      "long","present","similar","determine","value","small",
+                      "number","report","condition","location","compare",
+                      "effect","period","first","different","represent",
+                      "upper","average","measure","estimate","site","important",
+                      "available","significant","reduce","term","flow",
+                      "information","limit","process","difference","associate",
+                      "potential","remain","observe","identify","sample",
+                      "surface","source","point","collect","factor","describe",
+                      "rate","develop","vary","natural","mean","affect",
+                      "basin","major","likely","control","model","example",
+                      "scale","cause","decrease","relatively","reach",
+                      "early","size","distribution","state","environmental",
+                      "type","generally","management","require","relative",
+                      "select","field","specific","land","survey","quality",
+                      "individual","research","calculate","relate","support",
+                      "pattern","approximately","influence","current","region",
+                      "comparison","conduct","locate","contain","record","least",
+                      "impact","annual","variable","cover","give","exist",
+                      "test","previous","produce","day","maximum","general",
+                      "structure","evaluate","contribute","approach",
+                      "standard","variation","development","account",
+                      "combine","order","focus","main","portion","little",
+                      "case","assess","characteristic","apply","resource",
+                      "recent","analyze","depth","consistent"]
+
+# The CountVectorizer analyzer that splits a text into its n-grams, made once
+# for each n-gram size
+ngramAnalyzers = {}
+def ngramAnalyzer(maxNgramSize):
+    from sklearn.feature_extraction.text import CountVectorizer
+    if int(maxNgramSize) not in ngramAnalyzers:
+        ngramAnalyzers[int(maxNgramSize)] = CountVectorizer(ngram_range=(1,int(maxNgramSize))).build_analyzer()
+    return ngramAnalyzers[int(maxNgramSize)]
+
+# Construct the n-grams (uni, bi, tri, quad, etc.) of a single pre-processed
+# text. Each n-gram is listed once, in the alphabetical order that fitting a
+# CountVectorizer to the text gives, and those two characters or shorter in 
+# length are left out of the training corpus
+def textNgrams(text,maxNgramSize):
+    ngrams = sorted(set(ngramAnalyzer(maxNgramSize)(text)))
+    return [i for i in ngrams if len(i) > 2]
+
+# Remove the commonest n-grams from the n-grams of a single text, in place
+def removeCommonest(ngrams):
+    commonest = set(commonestToRemove)
+    for word in ngrams:
+        if word in commonest:
+            del ngrams[ngrams.index(word)]
+    return ngrams
+
+######################### PRE-PROCESSED TOKEN STORE ###########################
+
+# With trainingOptions["tokenStore"] set, each pre-processed text is also kept
+# as an array of token IDs (the words that the n-gram analyzer splits it
+# into), in a Preprocessed Tokens folder next to the Document Details
+# database:
+#   Token IDs.npy: the token IDs of every text, one after another (uint32,
+#                  memory-mapped when opened)
+#   Token Store.npz: each text's database index, where its token IDs start
+#                    and end, and a checksum of its text
+#   Token Vocabulary.txt: the word of each token ID, one per line
+# N-grams are then made from the arrays without splitting the texts into
+# words again. The store is rebuilt when it doesn't match the database
+tokenStore = None
+
+def textChecksum(text):
+    return zlib.crc32(str(text).encode("utf-8"))
+
+def writeTokenStore(storePath, database):
+    os.makedirs(storePath, exist_ok=True)
+    vocabulary = {}
+    tokenIDs = []
+    offsets = [0]
+    texts = database["Preprocessed Text"].tolist()
+    for text in texts:
+        if isinstance(text, str):
+            tokenIDs.extend(vocabulary.setdefault(token, len(vocabulary)) for token in ngramAnalyzer(1)(text))
+        offsets.append(len(tokenIDs))
+    np.save(storePath + "/Token IDs.npy", np.array(tokenIDs, dtype=np.uint32))
+    np.savez(storePath + "/Token Store.npz", index=np.array(database.index), offsets=np.array(offsets, dtype=np.int64),
+             checksums=np.array([textChecksum(text) for text in texts], dtype=np.uint32))
+    with open(storePath + "/Token Vocabulary.txt", 'w', encoding='utf-8') as fp:
+        fp.write("\n".join(vocabulary))
+
+# Open the token store of a database, building it first if there isn't one
+# or if any of its texts have changed since it was built
+def openTokenStore(databaseFilepath, database):
+    storePath = os.path.join(os.path.dirname(databaseFilepath), "Preprocessed Tokens")
+    checksums = np.array([textChecksum(text) for text in database["Preprocessed Text"]], dtype=np.uint32)
+    for attempt in range(2):
+        if os.path.exists(storePath + "/Token Store.npz"):
+            with np.load(storePath + "/Token Store.npz") as saved:
+                index, offsets, savedChecksums = saved["index"], saved["offsets"], saved["checksums"]
+            if np.array_equal(index, np.array(database.index)) and np.array_equal(savedChecksums, checksums):
+                with open(storePath + "/Token Vocabulary.txt", 'r', encoding='utf-8') as fp:
+                    vocabulary = fp.read().split("\n")
+                return SimpleNamespace(tokenIDs=np.load(storePath + "/Token IDs.npy", mmap_mode='r'),
+                                       offsets=offsets, vocabulary=vocabulary,
+                                       rows={index: row for row, index in enumerate(index.tolist())},
+                                       checksums=checksums)
+        print("\nSaving the token IDs of the pre-processed texts...")
+        writeTokenStore(storePath, database)
+    raise RuntimeError("The token store in " + storePath + " couldn't be opened")
+
+# The same n-grams as textNgrams gives for the text, made from its token IDs.
+# Each distinct run of token IDs is joined into its n-gram once, and the
+# n-grams already joined for other texts are kept in ngramStrings
+def tokenNgrams(tokenIDs,maxNgramSize,vocabulary,ngramStrings):
+    tokenIDs = tokenIDs.tolist()
+    ngrams = []
+    for n in range(1, int(maxNgramSize)+1):
+        for run in set(zip(*[tokenIDs[i:] for i in range(n)])):
+            ngram = ngramStrings.get(run)
+            if ngram is None:
+                ngram = ngramStrings[run] = " ".join([vocabulary[i] for i in run])
+            ngrams.append(ngram)
+    return sorted(i for i in ngrams if len(i) > 2)
+
+# N-grams of the texts at the given database indices, from the token store
+# if it is open and holds the same texts, and from the texts otherwise. The
+# n-grams of one text are made at a time (see ngramCorpus)
+def ngramsOfTexts(indices,texts,maxNgramSize):
+    ngramStrings = {}
+    for index, text in zip(indices, texts):
+        row = tokenStore.rows.get(index) if tokenStore is not None else None
+        if row is not None and tokenStore.checksums[row] == textChecksum(text):
+            tokenIDs = tokenStore.tokenIDs[tokenStore.offsets[row]:tokenStore.offsets[row+1]]
+            yield tokenNgrams(tokenIDs,maxNgramSize,tokenStore.vocabulary,ngramStrings)
+        else:
+            yield textNgrams(text,maxNgramSize)
+
+########################### NEAR-DUPLICATE TEXTS ##############################
+
+# Re-issued reports and articles published more than once are trained on
+# once per copy, which over-weights their topics. Each pre-processed text is
+# summarized by a MinHash signature of its shingles (runs of shingleSize
+# words): the smallest hash of any of its shingles under each of 128 hash
+# functions. The share of values two signatures have in common estimates the
+# Jaccard similarity of the texts' shingles. Candidate pairs are found by
+# locality-sensitive hashing (only texts whose signatures are the same over
+# a whole band of 4 values are compared), so the texts aren't all compared
+# with each other. The signatures are kept in a Near Duplicates folder next
+# to the Document Details database, and only those of new or changed texts
+# are found when it is opened again
+minhashPermutations = 128
+minhashBands = 32
+mersennePrime = np.uint64((1 << 61) - 1)
+minhashSeeds = np.random.RandomState(61).randint(1, 2**31 - 1, size=(2, minhashPermutations, 1)).astype(np.uint64)
+emptySignature = np.uint32(0xFFFFFFFF)
+nearDuplicateIndex = None
+duplicateClusters = []
+documentWeights = None
+
+def minhashSignature(text, shingleSize):
+    words = str(text).split() if isinstance(text, str) else []
+    if not words:
+        return np.full(minhashPermutations, emptySignature, dtype=np.uint32)
+    wordHashes = {}
+    hashes = np.array([wordHashes.setdefault(word, zlib.crc32(word.encode("utf-8"))) for word in words], dtype=np.uint64)
+    # Hash of each shingle (texts shorter than a shingle are one shingle)
+    size = min(int(shingleSize), len(hashes))
+    shingles = np.zeros(len(hashes) - size + 1, dtype=np.uint64)
+    for i in range(size):
+        shingles = shingles*np.uint64(1000003) + hashes[i:len(shingles)+i]
+    shingles = np.unique(shingles & np.uint64(0xFFFFFFFF))
+    # Smallest value of each hash function, over chunks of the shingles
+    signature = np.full(minhashPermutations, emptySignature, dtype=np.uint64)
+    for start in range(0, len(shingles), 10000):
+        values = (minhashSeeds[0]*shingles[start:start+10000] + minhashSeeds[1]) % mersennePrime
+        signature = np.minimum(signature, (values & np.uint64(0xFFFFFFFF)).min(axis=1))
+    return signature.astype(np.uint32)
+
+# Open the MinHash signatures of a database's texts, finding those of any
+# texts that are new or have changed since they were saved
+def openNearDuplicateIndex(databaseFilepath, database):
+    indexPath = os.path.join(os.path.dirname(databaseFilepath), "Near Duplicates")
+    shingleSize = int(trainingOptions["shingleSize"])
+    checksums = np.array([textChecksum(text) for text in database["Preprocessed Text"]], dtype=np.uint32)
+    saved = {}
+    if os.path.exists(indexPath + "/MinHash Signatures.npz"):
+        with np.load(indexPath + "/MinHash Signatures.npz") as savedIndex:
+            if int(savedIndex["shingleSize"]) == shingleSize:
+                saved = {(index, checksum): signature for index, checksum, signature
+                         in zip(savedIndex["index"].tolist(), savedIndex["checksums"].tolist(), savedIndex["signatures"])}
+    signatures = np.empty((len(database), minhashPermutations), dtype=np.uint32)
+    found = 0
+    for row, (index, checksum, text) in enumerate(zip(database.index.tolist(), checksums.tolist(), database["Preprocessed Text"])):
+        signature = saved.get((index, checksum))
+        if signature is None:
+            signature = minhashSignature(text, shingleSize)
+            found += 1
+        signatures[row] = signature
+    if found or len(saved) != len(database):
+        print("\nSaving the MinHash signatures of " + str(found) + " new or changed texts...")
+        os.makedirs(indexPath, exist_ok=True)
+        np.savez(indexPath + "/MinHash Signatures.npz", index=np.array(database.index), checksums=checksums,
+                 signatures=signatures, shingleSize=shingleSize)
+    return SimpleNamespace(signatures=signatures, checksums=checksums,
+                           rows={index: row for row, index in enumerate(database.index.tolist())})
+
+# Signatures of the texts at the given database indices, from the index if it
+# is open and holds the same texts, and from the texts otherwise
+def textSignatures(indices, texts):
+    signatures = np.empty((len(indices), minhashPermutations), dtype=np.uint32)
+    for number, (index, text) in enumerate(zip(indices, texts)):
+        row = nearDuplicateIndex.rows.get(index) if nearDuplicateIndex is not None else None
+        if row is not None and nearDuplicateIndex.checksums[row] == textChecksum(text):
+            signatures[number] = nearDuplicateIndex.signatures[row]
+        else:
+            signatures[number] = minhashSignature(text, trainingOptions["shingleSize"])
+    return signatures
+
+# Clusters of near-duplicates among the signatures, as lists of row numbers
+# in order (clusters of one text are left out)
+def nearDuplicateClusters(signatures):
+    parents = list(range(len(signatures)))
+    def root(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+    
+    similarity = float(trainingOptions["duplicateSimilarity"])
+    rowsPerBand = minhashPermutations // minhashBands
+    texts = np.flatnonzero((signatures != emptySignature).any(axis=1)).tolist()
+    compared = set()
+    for band in range(minhashBands):
+        buckets = {}
+        for i in texts:
+            buckets.setdefault(signatures[i, band*rowsPerBand:(band+1)*rowsPerBand].tobytes(), []).append(i)
+        for bucket in buckets.values():
+            for i, j in combinations(bucket, 2):
+                if (i, j) in compared or root(i) == root(j):
+                    continue
+                compared.add((i, j))
+                if (signatures[i] == signatures[j]).mean() >= similarity:
+                    parents[max(root(i), root(j))] = min(root(i), root(j))
+    
+    clusters = {}
+    for i in texts:
+        clusters.setdefault(root(i), []).append(i)
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
+
+# Remove all but the first text of each cluster of near-duplicates from the
+# selected rows of the database, or give each text of a cluster an equal
+# share of one text's weight, as trainingOptions["nearDuplicates"] asks.
+# Returns the rows, the titles of each cluster's texts, and the weight of
+# each row (None if the texts aren't down-weighted)
+def handleNearDuplicates(database):
+    handling = trainingOptions["nearDuplicates"]
+    if handling not in ["exclude", "downweight"]:
+        raise ValueError("Unknown nearDuplicates option: " + str(handling))
+    clusters = nearDuplicateClusters(textSignatures(database.index.tolist(), database["Preprocessed Text"]))
+    titles = database["Document Title"].tolist()
+    clusterTitles = [[titles[i] for i in cluster] for cluster in clusters]
+    print("\nFound " + str(len(clusters)) + " clusters of near-duplicate texts ("
+          + str(sum(len(cluster) for cluster in clusters)) + " texts)")
+    if handling == "exclude":
+        duplicates = [i for cluster in clusters for i in cluster[1:]]
+        return database.drop(database.index[duplicates]), clusterTitles, None
+    weights = np.ones(len(database))
+    for cluster in clusters:
+        weights[cluster] = 1/len(cluster)
+    return database, clusterTitles, weights.tolist()
+
+############################## N-GRAM CORPUS ##################################
+
+# A training corpus kept as integers: the n-grams of all documents are
+# numbered once in alphabetical order (the vocabulary), and each document is
+# a run of those numbers (indices, starting at indptr[document]), as in a
+# compressed sparse row matrix. Indexing or iterating over it still gives
+# each document's list of n-gram strings, so it can be used anywhere a list
+# of lists of n-grams was (corpora.Dictionary, CoherenceModel, json). Counts
+# over the whole corpus are made from the integers (see ngramCounts,
+# corpusDictionary, and buildNgramIndex)
+class NgramCorpus:
+
+    def __init__(self, vocabulary, indptr, indices):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        self.vocabularyIDs = None
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, document):
+        document = range(len(self))[document]
+        return [self.vocabulary[i] for i in self.indices[self.indptr[document]:self.indptr[document+1]].tolist()]
+
+    def __iter__(self):
+        for document in range(len(self)):
+            yield self[document]
+
+    def __add__(self, other):
+        return ngramCorpus(itertools.chain(self, other))
+
+    # Number of each n-gram in the vocabulary (built when first needed)
+    def ngramID(self, ngram):
+        if self.vocabularyIDs is None:
+            self.vocabularyIDs = {ngram: i for i, ngram in enumerate(self.vocabulary)}
+        return self.vocabularyIDs.get(ngram)
+
+    # The corpus of the given documents only, sharing the same vocabulary
+    def documents(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = self.indptr[rows+1] - self.indptr[rows]
+        indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        if len(rows):
+            indices = np.concatenate([self.indices[self.indptr[row]:self.indptr[row+1]] for row in rows.tolist()])
+        else:
+            indices = np.zeros(0, dtype=np.uint32)
+        return NgramCorpus(self.vocabulary, indptr, indices.astype(np.uint32))
+
+    # The corpus without the n-grams whose entry in keep (one per n-gram of
+    # the vocabulary) is False
+    def keepNgrams(self, keep):
+        kept = keep[self.indices]
+        indptr = np.concatenate([[0], np.cumsum(kept)])[self.indptr].astype(np.int64)
+        return NgramCorpus(self.vocabulary, indptr, self.indices[kept])
+
+    # The same Counter of n-gram frequencies as counting every n-gram of every
+    # document in turn, with the n-grams in the order they first appear
+    def ngramCounts(self):
+        counts = np.bincount(self.indices, minlength=len(self.vocabulary))
+        ngrams, firstPositions = np.unique(self.indices, return_index=True)
+        ngrams = ngrams[np.argsort(firstPositions)].tolist()
+        return Counter(dict(zip([self.vocabulary[i] for i in ngrams], counts[ngrams].tolist())))
+
+    # Count vector of each document (see NgramCountVectors)
+    def countVectors(self):
+        vocabularySize = max(len(self.vocabulary), 1)
+        documents = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+        pairs, firstPositions, counts = np.unique(documents*vocabularySize + self.indices,
+                                                  return_index=True, return_counts=True)
+        order = np.argsort(firstPositions, kind="stable")
+        pairs, counts = pairs[order], counts[order]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(pairs // vocabularySize, minlength=len(self)))])
+        return NgramCountVectors(self.vocabulary, indptr.astype(np.int64), pairs % vocabularySize, counts)
+
+    # The corpus after running removeCommonest on every document. That loop
+    # deletes from the list it is going over, so of several commonest n-grams
+    # in a row in a document, only the first, third, fifth, etc. are deleted;
+    # the same n-grams are deleted here
+    def withoutCommonest(self):
+        commonIDs = [i for i in (self.ngramID(ngram) for ngram in commonestToRemove) if i is not None]
+        isCommon = np.isin(self.indices, commonIDs)
+        positions = np.arange(len(self.indices))
+        documentStarts = np.zeros(len(self.indices), dtype=bool)
+        documentStarts[self.indptr[:-1][np.diff(self.indptr) > 0]] = True
+        runStarts = isCommon & (documentStarts | ~np.concatenate([[False], isCommon[:-1]]))
+        positionInRun = positions - np.maximum.accumulate(np.where(runStarts, positions, 0))
+        keep = ~(isCommon & (positionInRun % 2 == 0))
+        indptr = np.concatenate([[0], np.cumsum(keep)])[self.indptr].astype(np.int64)
+        return NgramCorpus(self.vocabulary, indptr, self.indices[keep])
+
+# How many times each n-gram appears in each document of a corpus, kept as a
+# sparse count vector per document: its distinct n-grams (in the order they
+# first appear in it) and their counts, in the same compressed sparse row
+# layout as NgramCorpus. Made once for a shared corpus, so that the n-gram
+# frequencies of any region are a sum over its rows rather than a count of
+# every n-gram of every text again
+class NgramCountVectors:
+
+    def __init__(self, vocabulary, indptr, indices, counts):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+
+    # The same Counter as ngramCounts of the corpus of the given rows
+    def ngramCounts(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = self.indptr[rows+1] - self.indptr[rows]
+        total = int(lengths.sum())
+        # Positions of the rows' entries, one row after another
+        positions = np.arange(total) + np.repeat(self.indptr[rows] - (np.cumsum(lengths) - lengths), lengths)
+        ngrams = self.indices[positions]
+        frequencies = np.bincount(ngrams, weights=self.counts[positions], minlength=len(self.vocabulary))
+        # Where each n-gram first appears (the last of repeated assignments
+        # is kept, so the entries are assigned from last to first)
+        firstPositions = np.full(len(self.vocabulary), total, dtype=np.int64)
+        firstPositions[ngrams[::-1]] = np.arange(total)[::-1]
+        present = np.flatnonzero(firstPositions < total)
+        present = present[np.argsort(firstPositions[present], kind="stable")].tolist()
+        return Counter(dict(zip([self.vocabulary[i] for i in present], frequencies[present].astype(np.int64).tolist())))
+
+# Build an n-gram corpus from lists of n-grams, one list at a time so that
+# only the integers are kept
+def ngramCorpus(ngramLists):
+    if isinstance(ngramLists, NgramCorpus):
+        return ngramLists
+    firstIDs = {}
+    indices = array('I')
+    indptr = array('q', [0])
+    for ngrams in ngramLists:
+        indices.extend([firstIDs.setdefault(ngram, len(firstIDs)) for ngram in ngrams])
+        indptr.append(len(indices))
+    # Renumber the n-grams in alphabetical order
+    ngrams = list(firstIDs)
+    alphabetical = sorted(range(len(ngrams)), key=ngrams.__getitem__)
+    ranks = np.empty(len(ngrams), dtype=np.uint32)
+    ranks[alphabetical] = np.arange(len(ngrams), dtype=np.uint32)
+    return NgramCorpus([ngrams[i] for i in alphabetical], np.frombuffer(indptr, dtype=np.int64).copy(),
+                       ranks[np.frombuffer(indices, dtype=np.uint32)])
+
+# The dictionary and bag of words of a corpus, identical to those made by
+# corpora.Dictionary and doc2bow: each document's new n-grams are given the
+# next IDs in alphabetical order. Lists of lists, and corpora with more
+# n-grams than corpora.Dictionary keeps without pruning, use gensim itself
+def corpusDictionary(trainingCorpus):
+    import gensim.corpora as corpora
+    
+    if not isinstance(trainingCorpus, NgramCorpus) or len(trainingCorpus.vocabulary) > 2000000:
+        ngramIDs = corpora.Dictionary(trainingCorpus)
+        return ngramIDs, [ngramIDs.doc2bow(text) for text in trainingCorpus]
+    
+    vocabularySize = len(trainingCorpus.vocabulary)
+    documents = np.repeat(np.arange(len(trainingCorpus), dtype=np.int64), np.diff(trainingCorpus.indptr))
+    pairs, counts = np.unique(documents*vocabularySize + trainingCorpus.indices, return_counts=True)
+    documents, ngrams = pairs // vocabularySize, pairs % vocabularySize
+    # Order in which the n-grams were first seen, then alphabetical
+    present, firstPairs = np.unique(ngrams, return_index=True)
+    present = present[np.lexsort((present, documents[firstPairs]))]
+    newIDs = np.zeros(vocabularySize, dtype=np.int64)
+    newIDs[present] = np.arange(len(present))
+    
+    ngramIDs = corpora.Dictionary()
+    ngramIDs.token2id = {trainingCorpus.vocabulary[i]: j for j, i in enumerate(present.tolist())}
+    ngramIDs.dfs = dict(enumerate(np.bincount(newIDs[ngrams], minlength=len(present)).tolist()))
+    ngramIDs.cfs = dict(enumerate(np.bincount(newIDs[ngrams], weights=counts, minlength=len(present)).astype(np.int64).tolist()))
+    ngramIDs.num_docs = len(trainingCorpus)
+    ngramIDs.num_pos = int(counts.sum())
+    ngramIDs.num_nnz = len(pairs)
+    
+    order = np.lexsort((newIDs[ngrams], documents))
+    ids, counts = newIDs[ngrams][order].tolist(), counts[order].tolist()
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(documents, minlength=len(trainingCorpus)))]).tolist()
+    bagOfWords = [list(zip(ids[a:b], counts[a:b])) for a, b in zip(bounds[:-1], bounds[1:])]
+    return ngramIDs, bagOfWords
+
+############################ BUILD A SHARED CORPUS ############################
+
+# When modeling many regions (states, sub-basins, decades) in one batch, the
+# n-grams of every text in the database are constructed once, along with one
+# dictionary and bag of words for the whole database. Each region's training
+# corpus is then a slice of these rows rather than being built again
+@profiled("buildSharedCorpus", items=lambda database, maxNgramSize, removeCommon: len(database))
+def buildSharedCorpus(database,maxNgramSize,removeCommon):
+    
+    # Only rows with pre-processed text can be selected by textSelection
+    database = database[database["Preprocessed Text"].notna()]
+    
+    print("\nBuilding the shared corpus of all texts:")
+    ngramsPerText = ngramCorpus(ngramsOfTexts(database.index, tqdm(database["Preprocessed Text"].tolist()), maxNgramSize))
+    if removeCommon == "Y":
+        ngramsPerText = ngramsPerText.withoutCommonest()
+    
+    # One dictionary and bag of words for every text in the database
+    sharedIDs, sharedBagOfWords = corpusDictionary(ngramsPerText)
+    
+    # Alphabetical rank of each n-gram, needed to number a region's n-grams in
+    # the same order as corpora.Dictionary would
+    tokens = [sharedIDs[i] for i in range(len(sharedIDs))]
+    ranks = [0]*len(tokens)
+    for rank, i in enumerate(sorted(range(len(tokens)), key=tokens.__getitem__)):
+        ranks[i] = rank
+    
+    sharedCorpus = {"ngramSize": str(maxNgramSize),
+                    "removeCommonNgrams": removeCommon,
+                    "rows": {index: row for row, index in enumerate(database.index)},
+                    "ngrams": ngramsPerText,
+                    "counts": ngramsPerText.countVectors(),
+                    "ngramIDs": sharedIDs,
+                    "bagOfWords": sharedBagOfWords,
+                    "ranks": ranks}
+    return sharedCorpus
+
+# The training corpus of the selected texts, as a slice of the shared corpus
+def sliceSharedCorpus(sharedCorpus,indices):
+    return sharedCorpus["ngrams"].documents([sharedCorpus["rows"][index] for index in indices])
+
+# The dictionary and bag of words of the selected texts, renumbered from the 
+# shared corpus so that they are identical to building them from scratch with
+# corpora.Dictionary and doc2bow
+def sliceSharedBagOfWords(sharedCorpus,indices):
+    import gensim.corpora as corpora
+    
+    ranks = sharedCorpus["ranks"]
+    sharedIDs = sharedCorpus["ngramIDs"]
+    sharedToRegion = {}
+    bagOfWords = []
+    for index in indices:
+        sharedBow = sharedCorpus["bagOfWords"][sharedCorpus["rows"][index]]
+        # N-grams not yet seen in the region are numbered in alphabetical order
+        newIDs = sorted((i for i, count in sharedBow if i not in sharedToRegion), key=ranks.__getitem__)
+        for i in newIDs:
+            sharedToRegion[i] = len(sharedToRegion)
+        bagOfWords.append(sorted((sharedToRegion[i], count) for i, count in sharedBow))
+    
+    # Fill a new dictionary with the region's n-grams and their frequencies
+    ngramIDs = corpora.Dictionary()
+    ngramIDs.token2id = {sharedIDs[i]: j for i, j in sharedToRegion.items()}
+    for bow in bagOfWords:
+        for i, count in bow:
+            ngramIDs.dfs[i] = ngramIDs.dfs.get(i, 0) + 1
+            ngramIDs.cfs[i] = ngramIDs.cfs.get(i, 0) + count
+        ngramIDs.num_pos += sum(count for i, count in bow)
+        ngramIDs.num_nnz += len(bow)
+    ngramIDs.num_docs = len(bagOfWords)
+    return ngramIDs, bagOfWords
+
 ############################## CREATE THE CORPUS ##############################
 
 # All words that exist in the selected text must be combined into a single
-# corpus, one big dataset comprised of ngrams extracted from the text
-def createCorpus(selectedTexts,filepath):
+# corpus, one big dataset comprised of ngrams extracted from the text. If a
+# shared corpus (see buildSharedCorpus) is given, the n-grams of the selected
+# texts are taken from it instead
+@profiled("createCorpus", items=lambda selectedTexts, *args: len(selectedTexts))
+def createCorpus(selectedTexts,filepath,sharedCorpus=None):
+    import matplotlib.pyplot as plt
+    from PIL import Image
+    from wordcloud import WordCloud
     
     # Make n-gram size specified below global for final text output
     global ngramSize
@@ -859,13 +1809,7 @@ def createCorpus(selectedTexts,filepath):
     # when creating the corpus (1 = unigrams only, 2 = unigrams and bigrams,
     # 3 = uni, bi, and trigrams, etc.)
     def ngramSize(values,message):
-        while True:
-            x = input(message)
-            if x in values:
-                ngramSize.choice = x
-                break
-            else:
-                print("Invalid value: options are " + str(values))
+        ngramSize.choice = askUser("ngramSize",values,message)
         return ngramSize
     ngramSize(["1","2","3","4","5","6","7","8","9","10"],'''\nWhat maximum n-gram size would you like '''
                     '''to use for creating the training corpus? (Choose from 1 to 10): \n''')
@@ -874,29 +1818,20 @@ def createCorpus(selectedTexts,filepath):
     # containing n-grams derived from each selected text. This is made global
     # for later use
     global trainingCorpus
-    trainingCorpus = []
-         
-    # Loop through the texts for training the model
-    for i in range(len(textsForTraining)):
-        singleText = [textsForTraining[i]]
-        
-        # Construct ngrams from the text (uni, bi, tri, quad) and append them
-        # to the list of lists
-        count_vect = CountVectorizer(ngram_range=(1,int(ngramSize.choice)))
-        count_vect.fit_transform(singleText)
-        ngrams = count_vect.get_feature_names_out().tolist()
-        trainingCorpus.append(ngrams)
-
-    # Words two characters or shorter in length must be removed from the
-    # training corpus
-    trainingCorpus = [[i for i in nested if len(i) > 2] for nested in trainingCorpus]
+    if sharedCorpus is None:
+        trainingCorpus = ngramCorpus(ngramsOfTexts(selectedIndices,textsForTraining,ngramSize.choice))
+    else:
+        if sharedCorpus["ngramSize"] != ngramSize.choice:
+            raise ValueError("The shared corpus was built with a different n-gram size")
+        trainingCorpus = sliceSharedCorpus(sharedCorpus,selectedIndices)
  
-    # Unnest the list, these will be used to create a word cloud of the most
-    # common n-grams in the training corpus
-    textWordCloud = [val for sublist in trainingCorpus for val in sublist]
-    
-    # Create a dictionary of ngrams ordered by frequency
-    wordCloudList = Counter(textWordCloud)
+    # Count the n-grams of every text, these will be used to create a word
+    # cloud of the most common n-grams in the training corpus (summed from
+    # the count vectors of the selected rows of a shared corpus)
+    if sharedCorpus is None:
+        wordCloudList = trainingCorpus.ngramCounts()
+    else:
+        wordCloudList = sharedCorpus["counts"].ngramCounts([sharedCorpus["rows"][index] for index in selectedIndices])
 
     # Make choice to remove commonest n-grams global for final text output
     global removeCommonNgrams
@@ -905,59 +1840,23 @@ def createCorpus(selectedTexts,filepath):
     # removed from the training corpus before word cloud creation or LDA
     # algorithm training
     def removeCommonNgrams(values,message):
-        while True:
-            x = input(message)
-            if x in values:
-                removeCommonNgrams.yesNo = x
-                break
-            else:
-                print("Invalid value: options are " + str(values))
+        removeCommonNgrams.yesNo = askUser("removeCommonNgrams",values,message)
         return removeCommonNgrams.yesNo
     removeCommonNgrams(["Y","N"],'''\nWould you like to pre-emptively remove '''
                   '''the 150 commonest n-grams from the training corpus? (Y/N): \n''')
+    if sharedCorpus is not None and sharedCorpus["removeCommonNgrams"] != removeCommonNgrams.yesNo:
+        raise ValueError("The shared corpus was built with a different choice to remove the commonest n-grams")
 
     # Remove the n-grams if the user specified as such in the user input
     if removeCommonNgrams.yesNo == "Y":
         
-        # The 150 commonest ngrams in all 2,158 PDFs. These words potentially
-        # conceal spatiotemporally distinct research priorities
-        commonestToRemove = ["river","water","area","high","low","large","data",
-                             "time","increase","result","analysis","year","system",
-                             "range","great","occur","change","indicate","level",
-                              "long","present","similar","determine","value","small",
-                              "number","report","condition","location","compare",
-                              "effect","period","first","different","represent",
-                              "upper","average","measure","estimate","site","important",
-                              "available","significant","reduce","term","flow",
-                              "information","limit","process","difference","associate",
-                              "potential","remain","observe","identify","sample",
-                              "surface","source","point","collect","factor","describe",
-                              "rate","develop","vary","natural","mean","affect",
-                              "basin","major","likely","control","model","example",
-                              "scale","cause","decrease","relatively","reach",
-                              "early","size","distribution","state","environmental",
-                              "type","generally","management","require","relative",
-                              "select","field","specific","land","survey","quality",
-                              "individual","research","calculate","relate","support",
-                              "pattern","approximately","influence","current","region",
-                              "comparison","conduct","locate","contain","record","least",
-                              "impact","annual","variable","cover","give","exist",
-                              "test","previous","produce","day","maximum","general",
-                              "structure","evaluate","contribute","approach",
-                              "standard","variation","development","account",
-                              "combine","order","focus","main","portion","little",
-                              "case","assess","characteristic","apply","resource",
-                              "recent","analyze","depth","consistent"]
-        
         # These loops remove these ngrams from both wordCloudList
-        # and trainingCorpus
+        # and trainingCorpus (already done in a shared corpus)
         for word in list(wordCloudList):
             if word in commonestToRemove:
                 del wordCloudList[word]
-        for sublist in trainingCorpus:
-            for word in sublist:
-                if word in commonestToRemove:
-                    del trainingCorpus[trainingCorpus.index(sublist)][sublist.index(word)]
+        if sharedCorpus is None:
+            trainingCorpus = trainingCorpus.withoutCommonest()
         
     # Construct a word cloud of the 100 most common n-grams
     wordCloud = WordCloud(background_color="white",colormap="plasma",collocations=False, contour_width=10,
@@ -975,26 +1874,435 @@ def createCorpus(selectedTexts,filepath):
     plt.axis("off")
     plt.savefig(filepath + "/Model Training Results/" + textsOfInterest.texts + "/Full Corpus.png",dpi=300)
     
+    # Prune the vocabulary of the training corpus, if asked to, after the
+    # word cloud of the full corpus is made
+    global unprunedCorpus, vocabularyPruning
+    unprunedCorpus = trainingCorpus
+    trainingCorpus, vocabularyPruning = pruneVocabulary(trainingCorpus)
+    
+    # Index the documents each n-gram of the training corpus appears in
+    global ngramIndex
+    ngramIndex = buildNgramIndex(trainingCorpus)
+    
     return trainingCorpus
 
+############################ PRUNE THE VOCABULARY #############################
+
+# N-grams in very few documents or in nearly all of them add to the size of
+# the topic-word matrices of every LDA fit without helping to tell topics
+# apart. Between creating the corpus and making its bag of words, the
+# n-grams are pruned by the thresholds in trainingOptions (in this order):
+# minimum number of documents, maximum fraction of documents, the most
+# n-grams of each order, and the most n-grams overall. Where only some
+# n-grams can be kept, those in the most documents are kept, then the first
+# alphabetically. Returns the pruned corpus, and the numbers of n-grams kept
+# and pruned (None if nothing was asked to be pruned)
+unprunedCorpus = None
+vocabularyPruning = None
+
+def pruneVocabulary(trainingCorpus):
+    minDocuments = int(trainingOptions["minDocumentFrequency"])
+    maxFraction = float(trainingOptions["maxDocumentFraction"])
+    keepTop = int(trainingOptions["keepTopNgrams"])
+    orderCaps = {int(order): int(cap) for order, cap in dict(trainingOptions["maxNgramsPerOrder"]).items()}
+    if minDocuments <= 1 and maxFraction >= 1 and keepTop <= 0 and not orderCaps:
+        return trainingCorpus, None
+    
+    trainingCorpus = ngramCorpus(trainingCorpus)
+    documents = np.repeat(np.arange(len(trainingCorpus), dtype=np.int64), np.diff(trainingCorpus.indptr))
+    pairs = np.unique(documents*len(trainingCorpus.vocabulary) + trainingCorpus.indices)
+    frequencies = np.bincount(pairs % len(trainingCorpus.vocabulary), minlength=len(trainingCorpus.vocabulary))
+    keep = frequencies > 0
+    pruning = {"ngramsBefore": int(keep.sum())}
+    
+    def keepMost(candidates, most):
+        candidates = np.flatnonzero(candidates)
+        ranked = candidates[np.lexsort((candidates, -frequencies[candidates]))]
+        keep[ranked[most:]] = False
+        return len(ranked[most:])
+    
+    before = keep.sum()
+    keep &= frequencies >= minDocuments
+    pruning["tooFewDocuments"] = int(before - keep.sum())
+    before = keep.sum()
+    keep &= frequencies <= maxFraction*len(trainingCorpus)
+    pruning["tooManyDocuments"] = int(before - keep.sum())
+    if orderCaps:
+        orders = np.array([ngram.count(" ") + 1 for ngram in trainingCorpus.vocabulary])
+        pruning["overOrderCaps"] = sum(keepMost(keep & (orders == order), cap) for order, cap in sorted(orderCaps.items()))
+    if keepTop > 0:
+        pruning["overTopNgrams"] = keepMost(keep, keepTop)
+    pruning["ngramsAfter"] = int(keep.sum())
+    
+    print("\nVocabulary pruned from " + str(pruning["ngramsBefore"]) + " to " + str(pruning["ngramsAfter"]) + " n-grams")
+    return trainingCorpus.keepNgrams(keep), pruning
+
+########################### INVERTED N-GRAM INDEX #############################
+
+# Which documents of the training corpus each n-gram appears in, so that
+# questions such as "which documents contain this n-gram?" (or all of, or any
+# of, several n-grams) don't need a pass over the whole corpus. Each n-gram's
+# postings (the numbers of its documents, in order) are kept as the gaps
+# between them, each gap as a variable-length integer of 7 bits per byte,
+# so that the index of a large corpus stays small. The index is built by
+# createCorpus, saved with the trained model, and used by the word webs and
+# the document-topic density table
+ngramIndex = None
+
+# Gaps as variable-length integers: the lowest 7 bits first, with the top
+# bit of every byte but the last set
+def encodePostings(gaps):
+    sizes = np.ones(len(gaps), dtype=np.int64)
+    for byte in range(1, 10):
+        sizes += gaps >= (1 << 7*byte)
+    starts = np.cumsum(sizes) - sizes
+    encoded = np.zeros(int(sizes.sum()), dtype=np.uint8)
+    for byte in range(int(sizes.max()) if len(gaps) else 0):
+        has = sizes > byte
+        encoded[starts[has] + byte] = ((gaps[has] >> 7*byte) & 0x7F) | ((sizes[has] > byte + 1) << 7)
+    return encoded, starts
+
+def decodePostings(encoded):
+    if len(encoded) == 0:
+        return np.zeros(0, dtype=np.int64)
+    encoded = encoded.astype(np.int64)
+    last = (encoded & 0x80) == 0
+    gap = np.concatenate([[0], np.cumsum(last[:-1])])
+    byte = np.arange(len(encoded)) - np.concatenate([[0], np.flatnonzero(last[:-1]) + 1])[gap]
+    gaps = np.zeros(gap[-1] + 1, dtype=np.int64)
+    np.add.at(gaps, gap, (encoded & 0x7F) << (7*byte))
+    return np.cumsum(gaps)
+
+class NgramIndex:
+
+    def __init__(self, vocabulary, offsets, postings, documentCount):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+        self.documentCount = documentCount
+        self.vocabularyIDs = None
+
+    # Number of each n-gram in the vocabulary (built when first needed)
+    def ngramID(self, ngram):
+        if self.vocabularyIDs is None:
+            self.vocabularyIDs = {ngram: i for i, ngram in enumerate(self.vocabulary)}
+        return self.vocabularyIDs.get(ngram)
+
+    # Documents the n-gram appears in (none if it isn't in the corpus)
+    def documents(self, ngram):
+        i = self.ngramID(ngram)
+        if i is None:
+            return np.zeros(0, dtype=np.int64)
+        return decodePostings(self.postings[self.offsets[i]:self.offsets[i+1]])
+
+    # Documents all of the n-grams appear in
+    def allOf(self, ngrams):
+        documents = np.arange(self.documentCount)
+        for ngram in sorted(ngrams, key=lambda ngram: self.frequency(ngram)):
+            documents = np.intersect1d(documents, self.documents(ngram), assume_unique=True)
+        return documents
+
+    # Documents any of the n-grams appear in
+    def anyOf(self, ngrams):
+        documents = [self.documents(ngram) for ngram in ngrams]
+        return np.unique(np.concatenate(documents)) if documents else np.zeros(0, dtype=np.int64)
+
+    # Number of documents the n-gram appears in, without decoding its postings
+    def frequency(self, ngram):
+        i = self.ngramID(ngram)
+        if i is None:
+            return 0
+        return int(np.count_nonzero(self.postings[self.offsets[i]:self.offsets[i+1]] < 0x80))
+
+    # Number of documents in which each pair of the given n-grams both appear
+    # (and each n-gram on its own, on the diagonal)
+    def cooccurrences(self, ngrams):
+        postings = [self.documents(ngram) for ngram in ngrams]
+        counts = np.zeros((len(ngrams), len(ngrams)), dtype=np.int64)
+        for i, j in itertools.combinations_with_replacement(range(len(ngrams)), 2):
+            counts[i, j] = counts[j, i] = len(np.intersect1d(postings[i], postings[j], assume_unique=True))
+        return counts
+
+    # Number of the given n-grams that appear in each document
+    def ngramsInDocuments(self, ngrams):
+        counts = np.zeros(self.documentCount, dtype=np.int64)
+        for ngram in ngrams:
+            counts[self.documents(ngram)] += 1
+        return counts
+
+    def save(self, indexPath):
+        np.savez_compressed(indexPath, vocabulary=np.array(self.vocabulary, dtype=str), offsets=self.offsets,
+                            postings=self.postings, documentCount=self.documentCount)
+
+def loadNgramIndex(indexPath):
+    with np.load(indexPath) as saved:
+        return NgramIndex(saved["vocabulary"].tolist(), saved["offsets"], saved["postings"], int(saved["documentCount"]))
+
+# Build the index of a training corpus
+def buildNgramIndex(trainingCorpus):
+    trainingCorpus = ngramCorpus(trainingCorpus)
+    vocabularySize, documentCount = len(trainingCorpus.vocabulary), len(trainingCorpus)
+    documents = np.repeat(np.arange(documentCount, dtype=np.int64), np.diff(trainingCorpus.indptr))
+    pairs = np.unique(np.asarray(trainingCorpus.indices, dtype=np.int64)*documentCount + documents)
+    ngrams, documents = pairs // documentCount, pairs % documentCount
+    # Gaps between each n-gram's documents, starting from document 0
+    gaps = documents.copy()
+    gaps[1:] -= documents[:-1]
+    firsts = np.concatenate([[True], ngrams[1:] != ngrams[:-1]])
+    gaps[firsts] = documents[firsts]
+    postings, starts = encodePostings(gaps)
+    offsets = np.concatenate([starts, [len(postings)]])[np.searchsorted(ngrams, np.arange(vocabularySize + 1))]
+    return NgramIndex(trainingCorpus.vocabulary, offsets.astype(np.int64), postings, documentCount)
+
+########################## SERIALIZE THE CORPUS ###############################
+
+# Write a corpus (bag of words, with or without TF-IDF weights) to a Matrix
+# Market file and read it back as a sparse matrix whose columns are the
+# documents. The result can be iterated over and indexed like the original.
+# This is an in-memory cache, not an out-of-core corpus: the whole matrix is
+# held in memory (far smaller than lists of tuples, but not streamed from
+# the file), and each fit still turns its columns back into documents one at
+# a time. The file itself is kept as the saved corpus of the trained model
+def serializeCorpus(corpus, corpusPath):
+    import gensim.corpora as corpora
+    from gensim import matutils
+    corpora.MmCorpus.serialize(corpusPath, corpus)
+    mmCorpus = corpora.MmCorpus(corpusPath)
+    sparseCorpus = matutils.corpus2csc(mmCorpus, num_terms=mmCorpus.num_terms, num_docs=mmCorpus.num_docs)
+    return matutils.Sparse2Corpus(sparseCorpus, documents_columns=True)
+
+# The corpus an LDA fit is trained on: near-duplicate texts share the weight of
+# one text, if asked to, and the corpus is then serialized as above
+def trainingMatrix(corpus, corpusPath):
+    if documentWeights is not None:
+        corpus = [[(ngramID, count*weight) for ngramID, count in document]
+                  for document, weight in zip(corpus, documentWeights)]
+    return serializeCorpus(corpus, corpusPath)
+
+############################# MULTICORE LDA FITS ##############################
+
+# The worker processes that LDA E-steps are split across, started on first use
+# and kept for every later fit
+ldaWorkerPool = None
+ldaWorkerCount = 0
+
+def getLdaWorkerPool(workers):
+    global ldaWorkerPool, ldaWorkerCount
+    if ldaWorkerPool is None or ldaWorkerCount != workers:
+        import atexit
+        import multiprocessing
+        if ldaWorkerPool is not None:
+            ldaWorkerPool.terminate()
+        ldaWorkerPool = multiprocessing.Pool(workers)
+        ldaWorkerCount = workers
+        atexit.register(ldaWorkerPool.terminate)
+    return ldaWorkerPool
+
+# Stands in for an LDA model in gensim's own E-step, counting the E-step
+# iterations it makes over the documents (gensim compares a document's change
+# with gamma_threshold once per iteration)
+class EStepModel:
+    def __init__(self, gammaThreshold, **attributes):
+        self.__dict__.update(attributes)
+        self.gammaThreshold = gammaThreshold
+        self.iterationsMade = 0
+    
+    @property
+    def gamma_threshold(self):
+        self.iterationsMade += 1
+        return self.gammaThreshold
+
+# gensim's E-step on a chunk of documents for an LDA model, adding the
+# documents and the E-step iterations made over them to counts
+def countedInference(ldaModel, counts, chunk, collect_sstats=False):
+    from gensim import models
+    chunk = list(chunk)
+    eStepModel = EStepModel(ldaModel.gamma_threshold, random_state=ldaModel.random_state,
+                            num_topics=ldaModel.num_topics, dtype=ldaModel.dtype,
+                            expElogbeta=ldaModel.expElogbeta, alpha=ldaModel.alpha,
+                            iterations=ldaModel.iterations)
+    gamma, sstats = models.LdaModel.inference(eStepModel, chunk, collect_sstats=collect_sstats)
+    counts["documents"] += len(chunk)
+    counts["iterations"] += eStepModel.iterationsMade
+    return gamma, sstats
+
+# Run in a worker process: gensim's own E-step on one shard of a chunk of
+# documents, starting from the shard's share of the chunk's initial gamma.
+# The number of E-step iterations made is returned as well
+def inferShard(shard, gamma, expElogbeta, alpha, iterations, gammaThreshold, collectSstats):
+    from gensim import models
+    shardModel = EStepModel(gammaThreshold, random_state=SimpleNamespace(gamma=lambda *args: gamma),
+                            num_topics=gamma.shape[1], dtype=expElogbeta.dtype,
+                            expElogbeta=expElogbeta, alpha=alpha, iterations=iterations)
+    gamma, sstats = models.LdaModel.inference(shardModel, shard, collect_sstats=collectSstats)
+    return gamma, sstats, shardModel.iterationsMade
+
+# Replaces an LDA model's E-step, splitting each chunk of documents into one
+# contiguous shard per worker. The initial gamma of the whole chunk is drawn
+# from the model's random state exactly as in the serial E-step, and the
+# shards' statistics are summed in a fixed order, so seeded fits give the same
+# result every time for a given number of workers
+def shardedInference(ldaModel, workers, chunk, collect_sstats=False, counts=None):
+    chunk = list(chunk)
+    gamma = ldaModel.random_state.gamma(100., 1. / 100., (len(chunk), ldaModel.num_topics))
+    bounds = np.linspace(0, len(chunk), workers + 1).astype(int)
+    shards = [(chunk[a:b], gamma[a:b], ldaModel.expElogbeta, ldaModel.alpha, ldaModel.iterations,
+               ldaModel.gamma_threshold, collect_sstats) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    results = getLdaWorkerPool(workers).starmap(inferShard, shards)
+    
+    gamma = np.concatenate([result[0] for result in results])
+    if collect_sstats:
+        sstats = np.zeros_like(ldaModel.expElogbeta, dtype=ldaModel.dtype)
+        for result in results:
+            sstats += result[1]
+    else:
+        sstats = None
+    if counts is not None:
+        counts["documents"] += len(chunk)
+        counts["iterations"] += sum(result[2] for result in results)
+    return gamma, sstats
+
+########################### EARLY STOPPING OF LDA FITS #######################
+
+# Raised by the convergence monitor to end an LDA fit after the current pass
+class TrainingConverged(Exception):
+    pass
+
+# Called by gensim at the end of every pass over the corpus (as a callback
+# metric), measuring how much the model changed during the pass. Once the
+# change stays below the tolerance for enough passes in a row, the fit is
+# ended. All M-steps of the pass are done by then, so the model is the same as
+# one trained with that number of passes in the first place
+def convergenceMonitor(corpus):
+    history = {"passes": 0, "previous": None, "stablePasses": 0}
+    
+    def measureChange(model=None, **kwargs):
+        history["passes"] += 1
+        if trainingOptions["convergenceMetric"] == "perplexity":
+            # The E-step below must not use up the model's random numbers
+            randomState = model.random_state.get_state()
+            documents = list(corpus)
+            gamma, _ = model.inference(documents)
+            # (bound expects each document's gamma as a one-row matrix)
+            value = model.bound(documents, gamma=gamma[:, np.newaxis, :]) / sum(cnt for doc in documents for _, cnt in doc)
+            model.random_state.set_state(randomState)
+        else:
+            value = model.get_topics()
+        
+        previous = history["previous"]
+        history["previous"] = value
+        if previous is None:
+            return None
+        if trainingOptions["convergenceMetric"] == "perplexity":
+            change = abs(value - previous) / abs(previous)
+        else:
+            change = np.abs(value - previous).sum(axis=1).max() / 2
+        
+        if change < float(trainingOptions["tolerance"]):
+            history["stablePasses"] += 1
+        else:
+            history["stablePasses"] = 0
+        if history["stablePasses"] >= int(trainingOptions["patience"]):
+            raise TrainingConverged()
+        return change
+    
+    # gensim only needs the metric's logger, title, and get_value
+    monitor = SimpleNamespace(logger=None, title="Convergence", get_value=measureChange)
+    return monitor, history
+
+# Train an LDA model, serially or with its E-step split across worker
+# processes depending on trainingOptions["ldaWorkers"] (or workers, if
+# given), and with early stopping if chosen in trainingOptions: after the
+# pass that converges in fits of several passes, or after the E-step
+# iteration that converges for each document in fits of one pass. The number
+# of passes made is kept for final text output, as is the mean number of
+# E-step iterations per document of each fit of one pass (the calibration
+# fits). Given warmStartFrom, the fit starts from that model's topics rather
+# than random ones
+def fitLDA(corpus, warmStartFrom=None, workers=None, **parameters):
+    from gensim import models
+    global passesUsed
+    workers = int(trainingOptions["ldaWorkers"]) if workers is None else int(workers)
+    passes = parameters.get("passes", 1)
+    earlyStopping = trainingOptions["earlyStopping"] and passes > 1
+    if trainingOptions["earlyStopping"] and passes == 1:
+        parameters.setdefault("gamma_threshold", float(trainingOptions["documentTolerance"]))
+    counts = {"documents": 0, "iterations": 0}
+    
+    # Same as passing the corpus to LdaModel, but with the sharded E-step
+    # and convergence monitor attached first if needed
+    ldaModel = models.LdaModel(corpus=None, **parameters)
+    if warmStartFrom is not None:
+        # Topics that the other model does not have keep their random start
+        shared = min(warmStartFrom.num_topics, ldaModel.num_topics)
+        ldaModel.state.sstats[:shared] = warmStartFrom.state.sstats[:shared]
+        ldaModel.sync_state()
+    if workers > 1:
+        ldaModel.inference = partial(shardedInference, ldaModel, workers, counts=counts)
+    else:
+        ldaModel.inference = partial(countedInference, ldaModel, counts)
+    if earlyStopping:
+        monitor, history = convergenceMonitor(corpus)
+        ldaModel.callbacks = [monitor]
+    try:
+        ldaModel.update(corpus)
+        passesUsed = passes
+    except TrainingConverged:
+        passesUsed = history["passes"]
+    finally:
+        # Leave a plain gensim model that can be saved as usual
+        del ldaModel.inference
+        ldaModel.callbacks = None
+    if passes == 1:
+        calibrationIterations.append(counts["iterations"]/max(counts["documents"], 1))
+    return ldaModel
+
+# Mean E-step iterations per document of each calibration fit (fits of one
+# pass) of the last trained model
+calibrationIterations = []
+
+# Neighbouring values of a calibration sweep give nearly the same model, so if
+# chosen in trainingOptions, the model of the nearest value already evaluated
+# is returned to warm start the fit of the next one
+def warmStartModel(ldaModels, value):
+    if not trainingOptions["warmStart"] or not ldaModels:
+        return None
+    return ldaModels[min(ldaModels, key=lambda evaluated: abs(evaluated - value))]
+
 ########################### LDA ALGORITHM TRAINING ############################
 
 # We enlist a Latent Dirichlet Allocation algorithm to probabilistically 
 # identify the likeliest n-grams (topics) by topic (document).
 # User input is included to allow users to specify this model's 
-# (hyper)parameters and later perform sensitivity analysis on the model's output
-def trainLDAAlgorithm(trainingCorpus, filepath):
+# (hyper)parameters and later perform sensitivity analysis on the model's output.
+# The dictionary and bag of words can be given if they were already made from
+# a shared corpus (see sliceSharedBagOfWords)
+@profiled("trainLDAAlgorithm", items=lambda trainingCorpus, *args: len(trainingCorpus))
+def trainLDAAlgorithm(trainingCorpus, filepath, presetIDs=None, presetBagOfWords=None):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from gensim import models
     
     # Make ngramIDs variable global for use when calibrating the eta
     # hyperparameter
     global ngramIDs
     
-    # Map all n-grams in the training corpus onto IDs
-    ngramIDs = corpora.Dictionary(trainingCorpus)
+    # A newly trained model has had no documents added to it yet, and its
+    # calibration fits are recorded afresh
+    global addedDocuments
+    addedDocuments = 0
+    calibrationIterations.clear()
     
-    # Convert each n-gram into a number using the doc2bow function, creating a 
-    # "bag of words"
-    bagOfWords = [ngramIDs.doc2bow(text) for text in trainingCorpus]
+    # (a shared corpus's dictionary and bag of words include the n-grams
+    # pruned from this corpus, so they are made again if it was pruned)
+    if presetIDs is not None and vocabularyPruning is None:
+        ngramIDs = presetIDs
+        bagOfWords = presetBagOfWords
+    else:
+        # Map all n-grams in the training corpus onto IDs, and convert each
+        # n-gram into a number as the doc2bow function does, creating a 
+        # "bag of words"
+        ngramIDs, bagOfWords = corpusDictionary(trainingCorpus)
 
     # Make choice to not apply TF-IDF below global for final text output
     global useTFIDF
@@ -1003,25 +2311,30 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
     # Frequency) correction should be used to weight n-grams by their frequency
     # of occurrence
     def useTFIDF(values,message):
-        while True:
-            x = input(message)
-            if x in values:
-                useTFIDF.yesNo = x
-                break
-            else:
-                print("Invalid value: options are " + str(values))
+        useTFIDF.yesNo = askUser("useTFIDF",values,message)
         return useTFIDF.yesNo
     useTFIDF(["Y","N"],'''\nWould you like to use a TF-IDF algorithm '''
                   '''to weight n-grams by their frequency in the training corpus? (Y/N): \n''')
 
     # Apply the TF-IDF correction to the training corpus if the user wants it;
     # lower n-gram frequency means greater assigned weight
-    global corpus
+    # (the TF-IDF model is kept for saving alongside the trained model)
+    global corpus, tfidf
     if useTFIDF.yesNo == "Y":
         tfidf = models.TfidfModel(bagOfWords)
         corpus = tfidf[bagOfWords]
     else:
+        tfidf = None
         corpus = bagOfWords
+        
+    # Near-duplicate texts share the weight of one text, if asked to, and the
+    # corpus is written once to the Trained Model folder and read back as a
+    # compact in-memory sparse matrix, so the hundreds of LDA fits below
+    # neither hold it as lists of tuples nor recompute the TF-IDF weights on
+    # every pass
+    modelPath = filepath + "/Model Training Results/" + textsOfInterest.texts + "/Trained Model"
+    os.makedirs(modelPath, exist_ok=True)
+    corpus = trainingMatrix(corpus, modelPath + "/Corpus.mm")
 
     # The four key parameters of the LDA algorithm (number of topics, generated
     # random numbers that seed each topic, and the alpha and eta hyperparameters)
@@ -1030,6 +2343,7 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
     # Start with number of topics. Trial different numbers to find what 
     # maximizes both the coherence and Jaccard similarity scores of the trained
     # LDA algorithm.   
+    @profiled("calibrateNumTopics")
     def calibrateNumTopics(topicRange, filepath):
         # The number of model runs depends on the number of topics tested, 
         # which is capped between 2 and 7, in order to prevent the commonest
@@ -1047,7 +2361,9 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
         for i in tqdm(iterable):
 
             # First train the algorithm itself
-            ldaModels[i] = models.LdaModel(corpus=corpus,
+            # (the model with one fewer topic starts this one if warm starting)
+            ldaModels[i] = fitLDA(corpus=corpus,
+                                      warmStartFrom=warmStartModel(ldaModels, i),
                                       id2word=ngramIDs,
                                       num_topics=i,
                                       random_state=np.random.RandomState(0),
@@ -1136,6 +2452,7 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
     # Based on gensim documentation, Griffiths and Steyvers (2004), and
     # Steyvers et al. (2007), default values of alpha and eta of 50/numTopics
     # and 0.1, respectively, users can pick these or calibrate their own.
+    @profiled("calibrateSeedAlphaEta", detail=lambda parameter: parameter)
     def calibrateSeedAlphaEta(parameter):
         
         # Make choice to use default alpha and eta below global for final text output
@@ -1145,13 +2462,7 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
         # User input for using default alpha and eta values if so desired
         if parameter == "alpha":
             def useDefaultAlpha(values,message):
-                while True:
-                    x = input(message)
-                    if x in values:
-                        useDefaultAlpha.yesNo = x
-                        break
-                    else:
-                        print("Invalid value: options are " + str(values))
+                useDefaultAlpha.yesNo = askUser("useDefaultAlpha",values,message)
                 return useDefaultAlpha.yesNo
             useDefaultAlpha(["Y","N"],'''\nWould you like to use the default value for ''' 
                           '''alpha (50/numTopics) to train the LDA algorithm? (Y/N): \n''')
@@ -1166,13 +2477,7 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
         # Same as above but for the value of eta
         elif parameter == "eta":
             def useDefaultEta(values,message):
-                while True:
-                    x = input(message)
-                    if x in values:
-                        useDefaultEta.yesNo = x
-                        break
-                    else:
-                        print("Invalid value: options are " + str(values))
+                useDefaultEta.yesNo = askUser("useDefaultEta",values,message)
                 return useDefaultEta.yesNo
             useDefaultEta(["Y","N"],'''\nWould you like to use the default value for ''' 
                           '''eta (0.1) to train the LDA algorithm? (Y/N): \n''')
@@ -1196,9 +2501,10 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
             print("\nCalibrating each potential " + parameter + ":")
             for i in tqdm(valueList):
 
-                # First train the model itself
+                # First train the model itself. Seed codes are never warm
+                # started, as the random start is what is being calibrated
                 if parameter == "seed code":
-                    ldaModels[i] = models.LdaModel(corpus=corpus, 
+                    ldaModels[i] = fitLDA(corpus=corpus, 
                                                     id2word=ngramIDs,
                                                     num_topics=numberOfTopics,
                                                     eval_every=None,
@@ -1207,7 +2513,8 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
                                                     alpha=1,
                                                     eta=0.1)
                 elif parameter == "alpha":
-                    ldaModels[i] = models.LdaModel(corpus=corpus, 
+                    ldaModels[i] = fitLDA(corpus=corpus, 
+                                                    warmStartFrom=warmStartModel(ldaModels, i),
                                                     id2word=ngramIDs,
                                                     num_topics=numberOfTopics,
                                                     eval_every=None,
@@ -1216,7 +2523,8 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
                                                     random_state=np.random.RandomState(0),
                                                     eta=0.1)
                 elif parameter == "eta":
-                    ldaModels[i] = models.LdaModel(corpus=corpus, 
+                    ldaModels[i] = fitLDA(corpus=corpus, 
+                                                    warmStartFrom=warmStartModel(ldaModels, i),
                                                     id2word=ngramIDs,
                                                     num_topics=numberOfTopics,
                                                     eval_every=None,
@@ -1287,17 +2595,37 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
     # of the LDA algorithm. The function below runs the model with 50 passes  
     # over the training corpus to yield likeliest n-grams associated with each  
     # topic, along with a coherence score.
+    @profiled("calibratedLDAAlgorithm")
     def calibratedLDAAlgorithm(numberOfTopics,seedCode,alphaValue,etaValue):
 
+        # Make the training times global for final text output
+        global trainingTime, serialTrainingTime
+        
         # Train the LDA algorithm with the calibrated parameters
-        ldaModel = models.LdaModel(corpus=corpus,id2word=ngramIDs,
-                                    num_topics=numberOfTopics,
-                                    random_state=np.random.RandomState(seedCode),
-                                    alpha=alphaValue,
-                                    eta=etaValue,
-                                    iterations=100,
-                                    passes=100,
-                                    eval_every=None)
+        parameters = dict(id2word=ngramIDs,
+                          num_topics=numberOfTopics,
+                          alpha=alphaValue,
+                          eta=etaValue,
+                          iterations=100,
+                          passes=100,
+                          eval_every=None)
+        start = time.perf_counter()
+        ldaModel = fitLDA(corpus=corpus,random_state=np.random.RandomState(seedCode),**parameters)
+        trainingTime = time.perf_counter() - start
+        
+        # If asked to, time the serial trainer on the same corpus as well,
+        # with the same early stopping settings
+        global passesUsed
+        serialTrainingTime = None
+        if trainingOptions["compareSerial"] and int(trainingOptions["ldaWorkers"]) > 1:
+            passesParallel = passesUsed
+            start = time.perf_counter()
+            fitLDA(corpus=corpus,workers=1,random_state=np.random.RandomState(seedCode),**parameters)
+            serialTrainingTime = time.perf_counter() - start
+            passesUsed = passesParallel
+            print("\nFinal model trained in %.1f s with %s workers, %.1f s serially (%.2fx speedup)"
+                  % (trainingTime, trainingOptions["ldaWorkers"], serialTrainingTime,
+                     serialTrainingTime/trainingTime))
                 
         # Make coherence global for final text output
         global coherence
@@ -1305,6 +2633,29 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
         coherence = models.CoherenceModel(model=ldaModel, texts=trainingCorpus,
                                           dictionary=ngramIDs, coherence='u_mass')
         
+        # If asked to, train the final model on the unpruned vocabulary as
+        # well, for comparing its training time and coherence. Its corpus is
+        # weighted and serialized in the same way (to a temporary file), so
+        # that the vocabulary is all that differs
+        if trainingOptions["comparePruning"] and vocabularyPruning is not None:
+            import tempfile
+            passesPruned = passesUsed
+            unprunedIDs, unprunedBagOfWords = corpusDictionary(unprunedCorpus)
+            if useTFIDF.yesNo == "Y":
+                unprunedBagOfWords = models.TfidfModel(unprunedBagOfWords)[unprunedBagOfWords]
+            with tempfile.TemporaryDirectory() as folder:
+                unprunedBagOfWords = trainingMatrix(unprunedBagOfWords, folder + "/Unpruned Corpus.mm")
+            start = time.perf_counter()
+            unprunedModel = fitLDA(corpus=unprunedBagOfWords,random_state=np.random.RandomState(seedCode),
+                                   **dict(parameters, id2word=unprunedIDs))
+            vocabularyPruning["unprunedTrainingTime"] = time.perf_counter() - start
+            vocabularyPruning["unprunedCoherence"] = models.CoherenceModel(model=unprunedModel, texts=unprunedCorpus,
+                                                                           dictionary=unprunedIDs, coherence='u_mass').get_coherence()
+            passesUsed = passesPruned
+            print("\nFinal model trained in %.1f s on %d n-grams, %.1f s on all %d n-grams (coherence %.3f vs %.3f)"
+                  % (trainingTime, vocabularyPruning["ngramsAfter"], vocabularyPruning["unprunedTrainingTime"],
+                     vocabularyPruning["ngramsBefore"], coherence.get_coherence(), vocabularyPruning["unprunedCoherence"]))
+        
         # Make the trained LDA algorithm available outside the function
         return ldaModel
     
@@ -1316,12 +2667,19 @@ def trainLDAAlgorithm(trainingCorpus, filepath):
 # The trained model can now be evaluated by constructing word clouds for
 # each topic and computing document-topics densities that summarize the most
 # appropriate document assignment
+@profiled("evaluateTrainedModel")
 def evaluateTrainedModel(trainedModel,filepath):
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    from netgraph import Graph, get_circular_layout, get_bundled_edge_paths
+    from PIL import Image
+    from wordcloud import WordCloud
     
     print("\nPlease wait while the trained model is evaluated...")
     
     # Firstly, construct the word clouds; the largest words are those that occur
     # in each topic the most frequently
+    @profiled("wordCloudPerTopic")
     def wordCloudPerTopic(filepath):
         
         # The while loop runs until numberOfTopics is reached
@@ -1348,6 +2706,7 @@ def evaluateTrainedModel(trainedModel,filepath):
     # Secondly, compute document-topic densities for each document in the
     # training corpus, to determine the likelihood of the topics' association
     # with each one
+    @profiled("documentTopicDensity")
     def documentTopicDensity(filepath):
             
         # Empty list to hold the computed densities
@@ -1355,15 +2714,28 @@ def evaluateTrainedModel(trainedModel,filepath):
         assignedTopics = []
         
         # Calculate document-topic densities for each text and add to the
-        # empty list
+        # empty list. Densities kept from before an incremental update (see
+        # updateSavedModel) are used as they are, with the same smallest
+        # density of 1e-8 as get_document_topics
         docNumber = 0
         for doc in corpus:
-            docTopics = trainedModel.get_document_topics(corpus[docNumber],minimum_probability=0)
+            if keptDensities is not None and docNumber in keptDensities:
+                docTopics = [(topic, density) for topic, density in enumerate(keptDensities[docNumber])
+                             if density >= 1e-8]
+            else:
+                docTopics = trainedModel.get_document_topics(corpus[docNumber],minimum_probability=0)
             # Add the document-topic densities to one list
             densityList.append(docTopics)
             # Add the likeliest topic for each document to the other
             assignedTopics.append(max(docTopics,key=itemgetter(1))[0]+1)
             docNumber += 1
+        
+        # All densities of each document are kept for saving with the model
+        global documentDensities
+        documentDensities = np.zeros((len(densityList), numberOfTopics), dtype=np.float32)
+        for j, docTopics in enumerate(densityList):
+            for topic, density in docTopics:
+                documentDensities[j, topic] = density
 
         # The nested for loop regroups the calculated document-topic densities
         # by number of topics, and produces corresponding column names
@@ -1396,8 +2768,13 @@ def evaluateTrainedModel(trainedModel,filepath):
             # Reduce probabilities to 3 decimal places
             df[colName] = df[colName].astype(str).str[:5]
         
-        # Add the likeliest topic and document URLs as final dataframe columns
+        # Add the likeliest topic and document URLs as final dataframe columns,
+        # along with how many of the likeliest topic's 25 likeliest n-grams
+        # (those of its word web) each document contains
         df["Likeliest Topic"] = assignedTopics
+        topicNgramCounts = [ngramIndex.ngramsInDocuments(list(dict(trainedModel.show_topic(topic, topn=25))))
+                            for topic in range(numberOfTopics)]
+        df["Likeliest Topic N-grams in Document"] = [int(topicNgramCounts[topic-1][j]) for j, topic in enumerate(assignedTopics)]
         df["URL"] = urls
         
         # Sort by the likeliest topics and reset the index
@@ -1412,6 +2789,7 @@ def evaluateTrainedModel(trainedModel,filepath):
     # Finally, word webs are created that illustrate the pairwise occurrence of 
     # the commonest n-grams together in the same documents. A spreadsheet that
     # quantifies the contents of each word web is also created.
+    @profiled("wordWebs")
     def wordWebs(filepath):
         
         # Run while loop until numberOfTopics is reached
@@ -1440,14 +2818,11 @@ def evaluateTrainedModel(trainedModel,filepath):
             # This list will hold the frequency of each n-gram pair
             pairFrequencies = []
             
-            # Run each pair of n-grams back through the training corpus. The
+            # Look up the documents of each n-gram in the inverted index. The
             # frequency of each pair within the same documents is recorded
-            for i in range(len(pairedNgrams)):
-                pairCount = 0 
-                for j in range(len(trainingCorpus)):
-                    if pairedNgrams[i][0] in trainingCorpus[j] and pairedNgrams[i][1] in trainingCorpus[j]:
-                        pairCount = pairCount + 1
-                pairFrequencies.append(pairCount)
+            cooccurrences = ngramIndex.cooccurrences(ngramKeys)
+            for i, j in combinations(range(len(ngramKeys)),2):
+                pairFrequencies.append(int(cooccurrences[i][j]))
                         
             # Pairwise frequencies are also rescaled for color control, this
             # time from 0.1 to 1
@@ -1577,7 +2952,11 @@ def evaluateTrainedModel(trainedModel,filepath):
 
 # All of the end-user decisions that went into training the model, along 
 # with other outputs of interest, are written to a text file for later reference
-def writeTextFile(filePath, yesNo):
+def writeTextFile(filePath, yesNo, pruning=None):
+    # (updateSavedModel gives the vocabulary pruning of the updated model,
+    # rather than that of the region's corpus)
+    if pruning is None:
+        pruning = vocabularyPruning
     
     # Write and open a new text file
     with open(filePath + "/Model Training Results/" + textsOfInterest.texts + "/End-User Decisions and Other Outputs.txt", 'w') as file:
@@ -1601,7 +2980,367 @@ def writeTextFile(filePath, yesNo):
         else:
             file.write("\nCalibrated Eta:" + str(etaValue) + "\n")
         file.write("\nCoherence Score of the trained model:" + str(coherence.get_coherence()) + "\n")
+        file.write("\nWarm-started calibration sweeps:" + ("Y" if trainingOptions["warmStart"] else "N") + "\n")
+        file.write("\nWorker processes used to train each LDA fit:" + str(trainingOptions["ldaWorkers"]) + "\n")
+        # (not known for models saved before they were recorded)
+        if trainingTime is not None:
+            file.write("\nTraining time of the final model (s):" + str(round(trainingTime, 1)) + "\n")
+            file.write("\nPasses used to train the final model:" + str(passesUsed) + " of 100")
+            if trainingOptions["earlyStopping"]:
+                file.write(" (early stopping by " + trainingOptions["convergenceMetric"] + ", tolerance "
+                           + str(trainingOptions["tolerance"]) + ", patience " + str(trainingOptions["patience"]) + ")")
+            file.write("\n")
+        if calibrationIterations:
+            file.write("\nCalibration fits:" + str(len(calibrationIterations)) + " of one pass, E-step iterations per document "
+                       + "(" + ("document tolerance " + str(trainingOptions["documentTolerance"]) if trainingOptions["earlyStopping"]
+                                else "gensim's default tolerance") + "):"
+                       + str([round(iterations, 1) for iterations in calibrationIterations]) + "\n")
+        if addedDocuments:
+            file.write("\nDocuments added by incremental updates since the model was trained:" + str(addedDocuments)
+                       + " (see Incremental Updates.txt)\n")
+        if serialTrainingTime is not None:
+            file.write("\nSerial training time of the final model (s):" + str(round(serialTrainingTime, 1))
+                       + " (speedup: " + str(round(serialTrainingTime/trainingTime, 2)) + "x)\n")
+        if pruning is not None:
+            file.write("\nVocabulary pruning: minimum document frequency " + str(trainingOptions["minDocumentFrequency"])
+                       + ", maximum document fraction " + str(trainingOptions["maxDocumentFraction"])
+                       + ", n-grams kept " + (str(trainingOptions["keepTopNgrams"]) if int(trainingOptions["keepTopNgrams"]) > 0 else "all")
+                       + ", n-grams kept per order " + (str(dict(trainingOptions["maxNgramsPerOrder"])) if trainingOptions["maxNgramsPerOrder"] else "all") + "\n")
+            file.write("\nN-grams in the vocabulary:" + str(pruning["ngramsAfter"]) + " of "
+                       + str(pruning["ngramsBefore"]) + " (pruned: " + str(pruning["tooFewDocuments"])
+                       + " in too few documents, " + str(pruning["tooManyDocuments"]) + " in too many"
+                       + "".join(", " + str(pruning[key]) + " over the " + name for key, name in
+                                 [("overOrderCaps", "per-order limits"), ("overTopNgrams", "overall limit")] if key in pruning)
+                       + ")\n")
+            if "unprunedTrainingTime" in pruning:
+                file.write("\nUnpruned vocabulary: training time of the final model (s):"
+                           + str(round(pruning["unprunedTrainingTime"], 1)) + ", coherence score:"
+                           + str(pruning["unprunedCoherence"]) + "\n")
+        if trainingOptions["nearDuplicates"] != "keep":
+            file.write("\nNear-duplicate texts (" + ("all but the first of each cluster excluded" if trainingOptions["nearDuplicates"] == "exclude"
+                                                     else "each cluster down-weighted to one text")
+                       + ", similarity of at least " + str(trainingOptions["duplicateSimilarity"]) + " over "
+                       + str(trainingOptions["shingleSize"]) + "-word shingles):" + str(len(duplicateClusters)) + " clusters\n")
+            for cluster in duplicateClusters:
+                file.write("    " + " | ".join(str(title) for title in cluster) + "\n")
+        if trainingOptions["profileStages"]:
+            file.write("\nStage profile (full trace in Stage Profile.json):\n")
+            for line in profileSummary():
+                file.write(line + "\n")
+    
+    # Save the stages recorded for this model run as a Chrome trace
+    if trainingOptions["profileStages"]:
+        writeStageTrace(filePath + "/Model Training Results/" + textsOfInterest.texts + "/Stage Profile.json")
         
+####################### SAVE AND LOAD THE TRAINED MODEL #######################
+
+# The trained model, the n-gram IDs, the training corpus (as a Matrix Market
+# file), and everything else needed to evaluate the model again are saved in
+# a "Trained Model" folder, which moveToSubFolder moves into the sub-folder of
+# the model run. Figures and the density table can then be made again without
+# retraining the model
+def saveTrainedModel(trainedModel, filePath, yesNo, pruning=None):
+    import gensim.corpora as corpora
+    import json
+    
+    # (as in writeTextFile, updateSavedModel gives the updated model's pruning)
+    if pruning is None:
+        pruning = vocabularyPruning
+    
+    # Path to the folder holding the saved model
+    modelPath = filePath + "/Model Training Results/" + textsOfInterest.texts + "/Trained Model"
+    os.makedirs(modelPath, exist_ok=True)
+    
+    # Large arrays are stored separately so that they can be memory-mapped
+    trainedModel.save(modelPath + "/LDA Model", separately=["expElogbeta"])
+    ngramIDs.save(modelPath + "/N-gram IDs.dict")
+    # The corpus was already written by trainLDAAlgorithm
+    if not os.path.exists(modelPath + "/Corpus.mm"):
+        corpora.MmCorpus.serialize(modelPath + "/Corpus.mm", corpus)
+    if tfidf is not None:
+        tfidf.save(modelPath + "/TF-IDF Model")
+    # The document-topic densities, reused by updateSavedModel
+    if documentDensities is not None:
+        np.save(modelPath + "/Document Densities.npy", documentDensities)
+    
+    # The n-grams of each document, and the documents of each n-gram, needed
+    # for the word webs
+    with open(modelPath + "/Training Corpus.json", 'w', encoding='utf-8') as file:
+        json.dump(list(trainingCorpus), file)
+    ngramIndex.save(modelPath + "/N-gram Index.npz")
+    
+    # Document details for the document-topic density table
+    df = pd.DataFrame()
+    df["Document Title"] = titles
+    df["Citation"] = citations
+    df["Study State(s)"] = states
+    df["Study Sub-Basin(s)"] = subbasins
+    df["URL"] = urls
+    df.to_csv(modelPath + "/Document Details.csv")
+    
+    # End-user decisions and calibrated (hyper)parameters
+    settings = {"yesNo": yesNo,
+                "textsOfInterest": textsOfInterest.texts,
+                "ngramSize": ngramSize.choice,
+                "removeCommonNgrams": removeCommonNgrams.yesNo,
+                "useTFIDF": useTFIDF.yesNo,
+                "useDefaultAlpha": useDefaultAlpha.yesNo,
+                "useDefaultEta": useDefaultEta.yesNo,
+                "numberOfTopics": numberOfTopics,
+                "seedCode": seedCode,
+                "alphaValue": alphaValue,
+                "etaValue": etaValue,
+                "selectedIndices": selectedIndices,
+                "trainingTime": trainingTime,
+                "passesUsed": passesUsed,
+                "serialTrainingTime": serialTrainingTime,
+                "addedDocuments": addedDocuments,
+                "calibrationIterations": calibrationIterations,
+                "vocabularyPruning": pruning}
+    with open(modelPath + "/Model Settings.json", 'w', encoding='utf-8') as file:
+        json.dump(settings, file, indent=4)
+
+# Load a model saved by saveTrainedModel, restoring the variables that
+# evaluateTrainedModel relies on. The model's arrays are memory-mapped
+def loadTrainedModel(modelPath, mmap='r'):
+    import gensim.corpora as corpora
+    import json
+    from gensim import models
+    
+    global ngramIDs, corpus, tfidf, trainingCorpus, ngramIndex, numberOfTopics, seedCode, alphaValue, etaValue
+    global titles, citations, states, subbasins, urls, selectedIndices
+    global trainingTime, passesUsed, serialTrainingTime, addedDocuments
+    global textsOfInterest, ngramSize, removeCommonNgrams, useTFIDF, useDefaultAlpha, useDefaultEta
+    
+    trainedModel = models.LdaModel.load(modelPath + "/LDA Model", mmap=mmap)
+    ngramIDs = corpora.Dictionary.load(modelPath + "/N-gram IDs.dict")
+    corpus = corpora.MmCorpus(modelPath + "/Corpus.mm")
+    if os.path.exists(modelPath + "/TF-IDF Model"):
+        tfidf = models.TfidfModel.load(modelPath + "/TF-IDF Model")
+    else:
+        tfidf = None
+    with open(modelPath + "/Training Corpus.json", 'r', encoding='utf-8') as file:
+        trainingCorpus = ngramCorpus(json.load(file))
+    # (models saved before the index was kept have it built again)
+    if os.path.exists(modelPath + "/N-gram Index.npz"):
+        ngramIndex = loadNgramIndex(modelPath + "/N-gram Index.npz")
+    else:
+        ngramIndex = buildNgramIndex(trainingCorpus)
+    
+    df = pd.read_csv(modelPath + "/Document Details.csv", index_col = 0)
+    titles = df["Document Title"].tolist()
+    citations = df["Citation"].tolist()
+    states = df["Study State(s)"].tolist()
+    subbasins = df["Study Sub-Basin(s)"].tolist()
+    urls = df["URL"].tolist()
+    
+    with open(modelPath + "/Model Settings.json", 'r', encoding='utf-8') as file:
+        settings = json.load(file)
+    numberOfTopics = settings["numberOfTopics"]
+    seedCode = settings["seedCode"]
+    alphaValue = settings["alphaValue"]
+    etaValue = settings["etaValue"]
+    # (models saved before the database indices were kept don't have them)
+    selectedIndices = settings.get("selectedIndices")
+    # (nor the training times, nor documents added since training)
+    trainingTime = settings.get("trainingTime")
+    passesUsed = settings.get("passesUsed")
+    serialTrainingTime = settings.get("serialTrainingTime")
+    addedDocuments = settings.get("addedDocuments", 0)
+    calibrationIterations[:] = settings.get("calibrationIterations", [])
+    # The end-user decisions are normally attributes of the user input
+    # functions, so they are restored with the same attribute names
+    textsOfInterest = SimpleNamespace(texts=settings["textsOfInterest"])
+    ngramSize = SimpleNamespace(choice=settings["ngramSize"])
+    removeCommonNgrams = SimpleNamespace(yesNo=settings["removeCommonNgrams"])
+    useTFIDF = SimpleNamespace(yesNo=settings["useTFIDF"])
+    useDefaultAlpha = SimpleNamespace(yesNo=settings["useDefaultAlpha"])
+    useDefaultEta = SimpleNamespace(yesNo=settings["useDefaultEta"])
+    
+    return trainedModel
+
+# Make the word clouds, document-topic density table, and word webs of a 
+# saved model run again, without retraining, replacing those in its sub-folder
+def evaluateSavedModel(filePath, region, subFolderName):
+    folderPath = filePath + "/Model Training Results/" + region
+    subFolderPath = folderPath + "/" + subFolderName
+    
+    # Files already in the region's folder are left where they are
+    existingFiles = set(os.listdir(folderPath))
+    trainedModel = loadTrainedModel(subFolderPath + "/Trained Model")
+    evaluateTrainedModel(trainedModel, filePath)
+    
+    # Move the new figures and table into the sub-folder
+    for x in os.listdir(folderPath):
+        if x not in existingFiles:
+            os.replace(folderPath + "/" + x, subFolderPath + "/" + x)
+    
+    return trainedModel
+
+########################## INCREMENTAL MODEL UPDATES ##########################
+
+# Densities of all documents in the last evaluated model, and those that 
+# evaluateTrainedModel should keep rather than compute again (by document 
+# number in the corpus)
+documentDensities = None
+keptDensities = None
+# Number of documents added to the last trained or loaded model since it was
+# trained
+addedDocuments = 0
+
+# Make room in a trained LDA model for n-grams that were added to its n-gram
+# IDs after training. The new n-grams start with no weight in any topic beyond
+# that given by the eta prior
+def extendVocabulary(ldaModel, ngramIDs):
+    added = len(ngramIDs) - ldaModel.num_terms
+    if added <= 0:
+        return ldaModel
+    eta = ldaModel.eta
+    ldaModel.eta = np.concatenate([eta, np.repeat(eta.mean(axis=-1, keepdims=True), added, axis=-1)], axis=-1)
+    ldaModel.state.eta = ldaModel.eta.astype(ldaModel.dtype, copy=False)
+    ldaModel.state.sstats = np.hstack([ldaModel.state.sstats,
+                                       np.zeros((ldaModel.num_topics, added), dtype=ldaModel.dtype)])
+    ldaModel.id2word = ngramIDs
+    ldaModel.num_terms = len(ngramIDs)
+    ldaModel.sync_state()
+    return ldaModel
+
+# When documents are added to the database after a model was saved (e.g. by 
+# pre-processing only the new PDFs), the saved model of a region is updated
+# with them rather than calibrated and trained again. textSelection must have
+# been run for the region first, so that its current documents are known. The
+# new documents' n-grams are added to the n-gram IDs and the model is updated
+# with one online pass over the new documents alone. createCorpus must have
+# been run for the region as well: the new documents' n-grams are pruned and
+# near-duplicates weighted in the same way as when the region's corpus was
+# created, and only n-grams kept by pruning (or already in the saved model)
+# are added. The densities of saved documents are only computed again if the
+# topics they are made of changed enough, and the topic drift is flagged if
+# it is large enough that the model should be calibrated again. The updated
+# model, figures, density table, and text file replace those in the
+# sub-folder of the model run
+def updateSavedModel(filePath, subFolderName, database):
+    import json
+    from gensim import models
+    
+    global selectedIndices, trainingCorpus, ngramIndex, corpus, tfidf, keptDensities
+    global titles, citations, states, subbasins, urls, coherence, addedDocuments
+    
+    # N-grams kept by pruning the region's current corpus, and the weight of
+    # each current document, before the saved model replaces them
+    keptNgrams = None
+    if vocabularyPruning is not None:
+        keptNgrams = set(trainingCorpus.vocabulary[i] for i in np.unique(trainingCorpus.indices).tolist())
+    currentWeights = None
+    if documentWeights is not None:
+        currentWeights = dict(zip(selectedIndices, documentWeights))
+    
+    folderPath = filePath + "/Model Training Results/" + textsOfInterest.texts
+    subFolderPath = folderPath + "/" + subFolderName
+    modelPath = subFolderPath + "/Trained Model"
+    
+    # Documents of the region now, compared to those the model was trained on
+    currentIndices = list(selectedIndices)
+    existingFiles = set(os.listdir(folderPath))
+    trainedModel = loadTrainedModel(modelPath, mmap=None)
+    with open(modelPath + "/Model Settings.json", 'r', encoding='utf-8') as file:
+        yesNo = json.load(file)["yesNo"]
+    if selectedIndices is None:
+        raise ValueError("The saved model in " + subFolderName + " doesn't record its documents, so it must be trained again")
+    savedIndices = list(selectedIndices)
+    savedSet = set(savedIndices)
+    newIndices = [index for index in currentIndices if index not in savedSet]
+    if not newIndices:
+        print("\nNo new documents to add to the " + textsOfInterest.texts + " model.")
+        return trainedModel, False
+    print("\nUpdating the " + textsOfInterest.texts + " model with " + str(len(newIndices)) + " new documents...")
+    
+    # N-grams and details of the new documents, added after the saved ones
+    newTexts = database.loc[newIndices]
+    newNgrams = ngramCorpus(ngramsOfTexts(newIndices,newTexts["Preprocessed Text"],ngramSize.choice))
+    if removeCommonNgrams.yesNo == "Y":
+        newNgrams = newNgrams.withoutCommonest()
+    if keptNgrams is not None:
+        newNgrams = newNgrams.keepNgrams(np.array([ngram in keptNgrams or ngram in ngramIDs.token2id
+                                                   for ngram in newNgrams.vocabulary], dtype=bool))
+    trainingCorpus = trainingCorpus + newNgrams
+    ngramIndex = buildNgramIndex(trainingCorpus)
+    selectedIndices = savedIndices + newIndices
+    titles = titles + newTexts["Document Title"].tolist()
+    citations = citations + newTexts["Citations"].tolist()
+    states = states + newTexts["State(s)"].tolist()
+    subbasins = subbasins + newTexts["River/Sub-Basin(s)"].tolist()
+    urls = urls + newTexts["URL"].tolist()
+    
+    # New n-grams are given IDs after the saved ones, so the saved documents'
+    # bags of words are unchanged
+    oldTopics = trainedModel.get_topics()
+    ngramIDs.add_documents(newNgrams)
+    extendVocabulary(trainedModel, ngramIDs)
+    bagOfWords = [ngramIDs.doc2bow(ngrams) for ngrams in trainingCorpus]
+    if useTFIDF.yesNo == "Y":
+        tfidf = models.TfidfModel(bagOfWords)
+        bagOfWords = [tfidf[bow] for bow in bagOfWords]
+    # Near-duplicate texts share the weight of one text, as in trainLDAAlgorithm
+    if currentWeights is not None:
+        bagOfWords = [[(ngramID, count*currentWeights.get(index, 1)) for ngramID, count in bow]
+                      for bow, index in zip(bagOfWords, selectedIndices)]
+    os.makedirs(folderPath + "/Trained Model", exist_ok=True)
+    corpus = serializeCorpus(bagOfWords, folderPath + "/Trained Model/Corpus.mm")
+    trainedModel.update(bagOfWords[len(savedIndices):], passes=1)
+    
+    # How far each topic moved, as the share of its probability that changed
+    newTopics = trainedModel.get_topics()
+    seen = oldTopics.shape[1]
+    topicDrift = (np.abs(newTopics[:, :seen] - oldTopics).sum(axis=1) + newTopics[:, seen:].sum(axis=1)) / 2
+    recalibrate = topicDrift.max() > float(trainingOptions["recalibrationDrift"])
+    
+    # Saved densities are kept when the topics they are made of barely moved
+    keptDensities = {}
+    if os.path.exists(modelPath + "/Document Densities.npy"):
+        savedDensities = np.load(modelPath + "/Document Densities.npy")
+        expectedChange = savedDensities @ topicDrift
+        keptDensities = {int(docNumber): savedDensities[docNumber] for docNumber
+                         in np.flatnonzero(expectedChange <= float(trainingOptions["densityTolerance"]))}
+    keptCount = len(keptDensities)
+    try:
+        evaluateTrainedModel(trainedModel, filePath)
+    finally:
+        keptDensities = None
+    
+    # Write the text file again, with the coherence of the updated model
+    addedDocuments += len(newIndices)
+    coherence = models.CoherenceModel(model=trainedModel, texts=trainingCorpus,
+                                      dictionary=ngramIDs, coherence='u_mass')
+    # (the region's pruning is left as it is for its other model runs)
+    updatedPruning = None
+    if vocabularyPruning is not None:
+        updatedPruning = dict(vocabularyPruning, ngramsAfter=len(ngramIDs))
+    writeTextFile(filePath, yesNo, updatedPruning)
+    saveTrainedModel(trainedModel, filePath, yesNo, updatedPruning)
+    
+    # Keep a record of every update in the sub-folder
+    with open(subFolderPath + "/Incremental Updates.txt", 'a') as file:
+        file.write("\n" + time.strftime("%Y-%m-%d %H:%M") + ": added " + str(len(newIndices)) + " documents ("
+                   + str(len(ngramIDs) - seen) + " new n-grams), densities of "
+                   + str(len(savedIndices) - keptCount) + " saved documents computed again\n")
+        file.write("Topic drift:" + str(np.round(topicDrift.astype(float), 3).tolist()) + "\n")
+        if recalibrate:
+            file.write("Topic drift is above " + str(trainingOptions["recalibrationDrift"])
+                       + ", the model should be calibrated and trained again\n")
+    if recalibrate:
+        print("\nThe topics of the " + textsOfInterest.texts + " model drifted by up to " + str(round(topicDrift.max(), 3))
+              + "; it should be calibrated and trained again.")
+    
+    # Replace the sub-folder's figures, table, and saved model with the new ones
+    for x in os.listdir(folderPath):
+        if x not in existingFiles:
+            if os.path.isdir(subFolderPath + "/" + x):
+                shutil.rmtree(subFolderPath + "/" + x)
+            os.replace(folderPath + "/" + x, subFolderPath + "/" + x)
+    
+    return trainedModel, recalibrate
+
 ############################ MOVE TO A SUB-FOLDER ############################
 
 # All of the calibration charts, words clouds, the document-topic density
@@ -1626,7 +3365,86 @@ def moveToSubFolder(filePath, yesNo):
     # Copy all training results to the new sub-folder    
     shutil.copytree(folderPath, subFolderPath, dirs_exist_ok=True, ignore=shutil.ignore_patterns('Redo*'))
     
-    # Delete all files outside of the sub-folder
+    # Delete all files (and the saved model's folder) outside of the sub-folder
     fileList = os.listdir(folderPath)
     fileList = [x for x in fileList if not x.startswith("Redo")]
-    [os.remove(folderPath + "/" + x) for x in fileList]        
+    for x in fileList:
+        if os.path.isdir(folderPath + "/" + x):
+            shutil.rmtree(folderPath + "/" + x)
+        else:
+            os.remove(folderPath + "/" + x)        
+
+# =============================================================================
+#                        TOPIC INFERENCE FUNCTIONS
+# =============================================================================
+
+######################### LOAD A MODEL FOR INFERENCE ##########################
+
+# Saved models loaded for inference, by the path to their Trained Model folder,
+# so that each is only loaded once however many times it is used
+inferenceModels = {}
+
+# Load what is needed to find the topics of new texts from a model saved by
+# saveTrainedModel: the model (memory-mapped), n-gram IDs, TF-IDF model, and 
+# the decisions used to make the training corpus. Nothing global is changed,
+# so several saved models can be used side by side
+def loadInferenceModel(modelPath, mmap='r'):
+    import gensim.corpora as corpora
+    import json
+    from gensim import models
+    
+    if modelPath not in inferenceModels:
+        with open(modelPath + "/Model Settings.json", 'r', encoding='utf-8') as file:
+            settings = json.load(file)
+        if os.path.exists(modelPath + "/TF-IDF Model"):
+            tfidfModel = models.TfidfModel.load(modelPath + "/TF-IDF Model")
+        else:
+            tfidfModel = None
+        inferenceModels[modelPath] = SimpleNamespace(
+            ldaModel=models.LdaModel.load(modelPath + "/LDA Model", mmap=mmap),
+            ngramIDs=corpora.Dictionary.load(modelPath + "/N-gram IDs.dict"),
+            tfidf=tfidfModel,
+            ngramSize=settings["ngramSize"],
+            removeCommonNgrams=settings["removeCommonNgrams"])
+    return inferenceModels[modelPath]
+
+######################### INFER TOPICS OF NEW TEXTS ###########################
+
+# Bag of words of a new pre-processed text, made in the same way as those of
+# the training corpus. N-grams the model wasn't trained on are left out
+def inferenceBagOfWords(text, savedModel):
+    ngrams = textNgrams(text,savedModel.ngramSize)
+    if savedModel.removeCommonNgrams == "Y":
+        removeCommonest(ngrams)
+    bagOfWords = savedModel.ngramIDs.doc2bow(ngrams)
+    if savedModel.tfidf is not None:
+        bagOfWords = savedModel.tfidf[bagOfWords]
+    return bagOfWords
+
+# Fold new pre-processed texts into a saved model without retraining it. The
+# texts can be any iterable (e.g. a generator), and are read a batch at a time,
+# each batch going through one E-step of the model. The document-topic
+# densities (one row per text, one column per topic) are yielded per batch
+def inferTopicDensities(texts, modelPath, batchSize=500):
+    savedModel = loadInferenceModel(modelPath)
+    texts = iter(texts)
+    while True:
+        batch = [inferenceBagOfWords(text, savedModel) for text in itertools.islice(texts, batchSize)]
+        if not batch:
+            break
+        gamma, _ = savedModel.ldaModel.inference(batch)
+        yield gamma / gamma.sum(axis=1, keepdims=True)
+
+# Pre-process a single PDF with the same functions used for the database
+def preprocessPDF(pdfPath, stopwordsFilePath):
+    with fitz.open(pdfPath) as document:
+        text = pdfToText(document)
+    text = delUnwantedLines(text)
+    text = delInsideLines(text)
+    return tokenizeAndRemove(text,stopwordsFilePath)
+
+# Stream PDFs that aren't in the database through pre-processing and into a 
+# saved model, yielding the document-topic densities of each batch of PDFs
+def inferPDFTopics(pdfPaths, modelPath, stopwordsFilePath, batchSize=500):
+    texts = (preprocessPDF(pdfPath, stopwordsFilePath) for pdfPath in pdfPaths)
+    return inferTopicDensities(texts, modelPath, batchSize)
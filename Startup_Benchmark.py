@@ -0,0 +1,92 @@
+# Script Name: Startup_Benchmark
+# Author: Joshua (Jay) Wimhurst
+# Date Created: 10/19/2026
+# Date Last Edited: 10/19/2026
+
+################################ DESCRIPTION ##################################
+# Measures how long it takes to start working with the
+# Preprocessing_and_Topic_Modeling_Functions script: the cold start of a fresh
+# Python process that imports it, the time taken by each worker process of a
+# spawned pool to become ready, and for reference the import time of each of
+# the heavy modules that are only imported once the function using them runs.
+#
+# Usage: python Startup_Benchmark.py [--repeats 5] [--workers 4]
+###############################################################################
+
+# Necessary packages
+import argparse
+import importlib
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Folder holding this script and the functions script
+scriptFolder = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that are imported lazily by the functions script
+lazyModules = ["nltk.stem","sklearn.feature_extraction.text","gensim","matplotlib.pyplot",
+               "seaborn","networkx","netgraph","wordcloud","PIL.Image"]
+
+############################# IMPORT IN A NEW PROCESS #########################
+
+# Time the import of a module in a fresh Python process, returning both the
+# import time measured inside the process and the whole process wall time
+def timeImport(moduleName):
+    code = ("import time; t = time.perf_counter(); import " + moduleName +
+            "; print(time.perf_counter() - t)")
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=scriptFolder,
+                            capture_output=True, text=True, check=True).stdout
+    processTime = time.perf_counter() - start
+    return float(output.strip().splitlines()[-1]), processTime
+
+########################### IMPORT IN A POOL WORKER ###########################
+
+# Run inside each pool worker: import the functions script and report how
+# long that took
+def workerImport(_):
+    start = time.perf_counter()
+    importlib.import_module("Preprocessing_and_Topic_Modeling_Functions")
+    return time.perf_counter() - start
+
+# Time how long a spawned pool takes before every worker has imported the
+# functions script, as happens when pre-processing is run in parallel
+def timeWorkerSpawn(workers):
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        importTimes = pool.map(workerImport, range(workers), chunksize=1)
+    return time.perf_counter() - start, importTimes
+
+################################ RUN THE BENCHMARK ############################
+
+def runBenchmark(repeats, workers):
+    sys.path.insert(0, scriptFolder)
+
+    print("\nCold start (fresh process importing the functions script):")
+    results = [timeImport("Preprocessing_and_Topic_Modeling_Functions") for _ in range(repeats)]
+    print("  import: median %.3f s, process: median %.3f s" % (
+          statistics.median([r[0] for r in results]), statistics.median([r[1] for r in results])))
+
+    print("\nWorker spawn (" + str(workers) + " spawned workers importing the functions script):")
+    spawnTimes = [timeWorkerSpawn(workers) for _ in range(repeats)]
+    print("  pool ready: median %.3f s, per-worker import: median %.3f s" % (
+          statistics.median([s[0] for s in spawnTimes]),
+          statistics.median([t for s in spawnTimes for t in s[1]])))
+
+    print("\nModules imported only when the function using them is called:")
+    for moduleName in lazyModules:
+        try:
+            importTime = statistics.median([timeImport(moduleName)[0] for _ in range(repeats)])
+            print("  %-35s %.3f s" % (moduleName, importTime))
+        except subprocess.CalledProcessError:
+            print("  %-35s not installed" % moduleName)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the start-up cost of the functions script.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    runBenchmark(args.repeats, args.workers)
@@ -0,0 +1,329 @@
+# Script Name: Topic_Inference_Service
+# Author: Joshua (Jay) Wimhurst
+# Date Created: 10/19/2026
+# Date Last Edited: 10/19/2026
+
+################################ DESCRIPTION ##################################
+# A long-running local service around a model saved by Function_Calls or
+# Batch_Function_Calls, so that other tools can ask for topics without loading
+# Python, gensim, and the model every time. The model is loaded once
+# (memory-mapped) and answers JSON requests over HTTP on this computer or over
+# a Unix socket:
+#   GET  /health                         the model being served
+#   GET  /topics?topn=20                 likeliest n-grams of each topic
+#   POST /score {"texts": [...]}         document-topic densities of
+#                                        pre-processed texts (or "pdfs": [...]
+#                                        if the service was given --stopwords)
+#   POST /neighbours {"texts": [...], "k": 5}
+#                                        the k training documents whose topic
+#                                        densities are closest to each text's
+# Texts sent at about the same time by different requests are scored together
+# in one batch. The same script is also the client for the service.
+#
+# Usage: python Topic_Inference_Service.py serve --model "C:/Model Materials/Model Training Results/Iowa/<model run>/Trained Model" --port 8765
+#        python Topic_Inference_Service.py serve --model "<Trained Model folder>" --socket "/tmp/topics.sock"
+#        python Topic_Inference_Service.py query --port 8765 topics
+#        python Topic_Inference_Service.py query --socket "/tmp/topics.sock" score --data '{"texts": ["river flood sediment"]}'
+###############################################################################
+
+# Necessary packages
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+############################### THE SERVED MODEL ##############################
+
+# Set by loadService: the saved model (see loadInferenceModel), the training
+# documents' details and densities, and the stopwords file for PDFs
+servedModel = None
+modelPath = None
+trainingDocuments = None
+trainingDensities = None
+stopwordsFilePath = None
+
+# Load the saved model once for the lifetime of the service
+def loadService(path, stopwords=None):
+    import gensim.corpora as corpora
+    import Preprocessing_and_Topic_Modeling_Functions as ptm
+    global servedModel, modelPath, trainingDocuments, trainingDensities, stopwordsFilePath
+
+    modelPath = path
+    stopwordsFilePath = stopwords
+    servedModel = ptm.loadInferenceModel(path)
+    trainingDocuments = pd.read_csv(path + "/Document Details.csv", index_col = 0)
+
+    # Densities of the training documents are saved with the model; for
+    # models saved before they were, they are found from the saved corpus
+    if os.path.exists(path + "/Document Densities.npy"):
+        trainingDensities = np.load(path + "/Document Densities.npy")
+    else:
+        gamma, _ = servedModel.ldaModel.inference(list(corpora.MmCorpus(path + "/Corpus.mm")))
+        trainingDensities = gamma / gamma.sum(axis=1, keepdims=True)
+
+############################### MICRO-BATCHING ################################
+
+# Bags of words waiting to be scored, each with the event that tells its
+# request the densities are ready
+pendingBatches = queue.Queue()
+
+# Runs in its own thread: wait for a request, gather whatever other requests
+# arrive within batchWait seconds (up to batchSize documents), and score them
+# all with one E-step of the model
+def scoreBatches(batchSize, batchWait):
+    while True:
+        waiting = [pendingBatches.get()]
+        documents = len(waiting[0]["bagsOfWords"])
+        deadline = time.perf_counter() + batchWait
+        while documents < batchSize:
+            try:
+                waiting.append(pendingBatches.get(timeout=max(deadline - time.perf_counter(), 0)))
+            except queue.Empty:
+                break
+            documents += len(waiting[-1]["bagsOfWords"])
+
+        bagsOfWords = [bow for request in waiting for bow in request["bagsOfWords"]]
+        try:
+            gamma, _ = servedModel.ldaModel.inference(bagsOfWords)
+            densities = gamma / gamma.sum(axis=1, keepdims=True)
+        except Exception as error:
+            for request in waiting:
+                request["error"] = str(error)
+                request["done"].set()
+            continue
+        start = 0
+        for request in waiting:
+            request["densities"] = densities[start:start + len(request["bagsOfWords"])]
+            start += len(request["bagsOfWords"])
+            request["done"].set()
+
+# Document-topic densities of pre-processed texts, scored along with any
+# other requests' texts
+def scoreTexts(texts):
+    import Preprocessing_and_Topic_Modeling_Functions as ptm
+    request = {"bagsOfWords": [ptm.inferenceBagOfWords(text, servedModel) for text in texts],
+               "done": threading.Event()}
+    if not request["bagsOfWords"]:
+        return np.zeros((0, servedModel.ldaModel.num_topics))
+    pendingBatches.put(request)
+    request["done"].wait()
+    if "error" in request:
+        raise RuntimeError(request["error"])
+    return request["densities"]
+
+################################### QUERIES ###################################
+
+# PDFs are pre-processed one at a time, whichever request they come from: the
+# WordNet lemmatizer loads itself on first use in a way that isn't safe across
+# threads, and pre-processing records its stages in the functions script's
+# globals
+preprocessingLock = threading.Lock()
+
+# Strings of a request's field, which must be a list of strings (a bare
+# string would otherwise be scored one character at a time)
+def requestStrings(payload, field):
+    strings = payload.get(field, [])
+    if not isinstance(strings, list) or not all(isinstance(string, str) for string in strings):
+        raise ValueError('"' + field + '" must be a list of strings')
+    return strings
+
+# Pre-processed texts of a request, pre-processing any PDFs it names
+def requestTexts(payload):
+    import Preprocessing_and_Topic_Modeling_Functions as ptm
+    if not isinstance(payload, dict):
+        raise ValueError("The request body must be a JSON object")
+    texts = list(requestStrings(payload, "texts"))
+    pdfs = requestStrings(payload, "pdfs")
+    if pdfs:
+        if stopwordsFilePath is None:
+            raise ValueError("The service was started without --stopwords, so it can't pre-process PDFs")
+        for pdfPath in pdfs:
+            with preprocessingLock:
+                texts.append(ptm.preprocessPDF(pdfPath, stopwordsFilePath))
+    return texts
+
+def topicsQuery(query):
+    topn = int(query.get("topn", ["20"])[0])
+    return {"topics": [[[ngram, float(probability)] for ngram, probability in servedModel.ldaModel.show_topic(topic, topn=topn)]
+                       for topic in range(servedModel.ldaModel.num_topics)]}
+
+def scoreQuery(payload):
+    densities = scoreTexts(requestTexts(payload))
+    return {"densities": densities.tolist(),
+            "likeliestTopics": (densities.argmax(axis=1) + 1).tolist()}
+
+# Training documents closest to each text, by the Hellinger distance between
+# their document-topic densities
+def neighboursQuery(payload):
+    k = int(payload.get("k", 5))
+    densities = scoreTexts(requestTexts(payload))
+    distances = np.sqrt(0.5*((np.sqrt(densities)[:, None, :] - np.sqrt(trainingDensities)[None, :, :])**2).sum(axis=2))
+    neighbours = []
+    for row in distances:
+        nearest = np.argsort(row, kind="stable")[:k]
+        neighbours.append([{"document": int(i),
+                            "title": str(trainingDocuments["Document Title"].iloc[i]),
+                            "url": str(trainingDocuments["URL"].iloc[i]),
+                            "distance": float(row[i])} for i in nearest])
+    return {"neighbours": neighbours}
+
+############################### REQUEST HANDLER ###############################
+
+class TopicRequestHandler(BaseHTTPRequestHandler):
+
+    def sendJSON(self, status, content):
+        body = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def answer(self, query):
+        try:
+            self.sendJSON(200, query())
+        except (ValueError, KeyError, TypeError) as error:
+            self.sendJSON(400, {"error": str(error)})
+        except Exception as error:
+            self.sendJSON(500, {"error": str(error)})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self.answer(lambda: {"model": modelPath, "topics": servedModel.ldaModel.num_topics,
+                                 "ngrams": len(servedModel.ngramIDs), "documents": len(trainingDensities)})
+        elif url.path == "/topics":
+            self.answer(lambda: topicsQuery(parse_qs(url.query)))
+        else:
+            self.sendJSON(404, {"error": "Unknown query: " + url.path})
+
+    def do_POST(self):
+        queries = {"/score": scoreQuery, "/neighbours": neighboursQuery}
+        if self.path not in queries:
+            self.sendJSON(404, {"error": "Unknown query: " + self.path})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.sendJSON(400, {"error": "The request body must be JSON"})
+            return
+        self.answer(lambda: queries[self.path](payload))
+
+    # Unix socket clients have no address, so requests are logged without one
+    def log_message(self, format, *args):
+        sys.stderr.write("[" + self.log_date_time_string() + "] " + (format % args) + "\n")
+
+# Servers with room for many clients waiting to connect at the same time
+class LocalHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+############################## START THE SERVICE ##############################
+
+def serve(args):
+    loadService(args.model, args.stopwords)
+    threading.Thread(target=scoreBatches, args=(args.batchSize, args.batchWait), daemon=True).start()
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, TopicRequestHandler)
+        print("Serving " + args.model + " on " + args.socket)
+    else:
+        server = LocalHTTPServer((args.host, args.port), TopicRequestHandler)
+        print("Serving " + args.model + " on http://" + args.host + ":" + str(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+################################# THE CLIENT ##################################
+
+# HTTP connection made over a Unix socket instead of a network port
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, socketPath, timeout=60):
+        super().__init__("localhost", timeout=timeout)
+        self.socketPath = socketPath
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socketPath)
+
+# Send one query to a running service and return its JSON answer. GET is
+# used when there is no payload, POST otherwise
+def queryService(path, payload=None, host="127.0.0.1", port=8765, socketPath=None):
+    if socketPath:
+        connection = UnixHTTPConnection(socketPath)
+    else:
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        if payload is None:
+            connection.request("GET", path)
+        else:
+            connection.request("POST", path, body=json.dumps(payload),
+                               headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        answer = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError("The service answered " + str(response.status) + ": " + answer.get("error", ""))
+    return answer
+
+def query(args):
+    if args.query in ["health", "topics"]:
+        path = "/" + args.query + ("?topn=" + str(args.topn) if args.query == "topics" else "")
+        payload = None
+    else:
+        path = "/" + args.query
+        payload = json.loads(args.data) if args.data else {}
+    answer = queryService(path, payload, args.host, args.port, args.socket)
+    print(json.dumps(answer, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a saved topic model, or query a running one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serveParser = commands.add_parser("serve", help="Start the service")
+    serveParser.add_argument("--model", required=True, help="Trained Model folder of a saved model run")
+    serveParser.add_argument("--stopwords", help="Stopwords.csv, needed to score PDFs")
+    serveParser.add_argument("--batchSize", type=int, default=500,
+                             help="Most documents scored in one batch")
+    serveParser.add_argument("--batchWait", type=float, default=0.005,
+                             help="Seconds to wait for other requests to join a batch")
+
+    queryParser = commands.add_parser("query", help="Query a running service")
+    queryParser.add_argument("query", choices=["health", "topics", "score", "neighbours"])
+    queryParser.add_argument("--data", help="JSON payload of a score or neighbours query")
+    queryParser.add_argument("--topn", type=int, default=20)
+
+    for commandParser in [serveParser, queryParser]:
+        commandParser.add_argument("--host", default="127.0.0.1")
+        commandParser.add_argument("--port", type=int, default=8765)
+        commandParser.add_argument("--socket", help="Unix socket to use instead of a network port")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    else:
+        query(args)